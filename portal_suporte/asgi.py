@@ -5,6 +5,31 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+O ASGI atende SÓ o stream de eventos em tempo real (/eventos/, ver
+tickets/eventos.py): cada conexão SSE aberta é só uma tarefa no event loop, e não
+um worker bloqueado como aconteceria no WSGI. O resto do portal continua no WSGI
+(portal_suporte/wsgi.py). No ASGI as views síncronas rodariam todas numa única
+thread, e as respostas em stream com iterador síncrono (exportação CSV, downloads
+de anexo) seriam lidas inteiras para a memória antes do envio.
+
+Exemplo (gunicorn para o portal, uvicorn para os eventos, nginx na frente):
+
+    gunicorn portal_suporte.wsgi:application --bind 127.0.0.1:8000
+    uvicorn portal_suporte.asgi:application --host 127.0.0.1 --port 8001
+
+    location /eventos/ {
+        proxy_pass http://127.0.0.1:8001;
+        proxy_http_version 1.1;
+        proxy_buffering off;
+        proxy_read_timeout 1h;
+    }
+    location / {
+        proxy_pass http://127.0.0.1:8000;
+    }
+
+Qualquer outro caminho que chegue aqui por engano recebe 404, em vez de ser
+servido do jeito lento descrito acima.
 """
 
 import os
@@ -13,4 +38,26 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "portal_suporte.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Caminhos servidos pelo ASGI; todo o resto é do WSGI
+PREFIXOS_ASGI = ("/eventos/",)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and not scope["path"].startswith(PREFIXOS_ASGI):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 404,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": "Rota servida pelo WSGI (ver portal_suporte/asgi.py).".encode(),
+            }
+        )
+        return
+    await django_application(scope, receive, send)
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "tickets.apps.TicketsConfig", # App
 ]
 
@@ -129,6 +130,45 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
 
+# CACHE
+
+# Em produção aponte REDIS_URL para um Redis compartilhado entre os workers (requer o pacote 'redis').
+# Sem ele usamos cache em arquivo, que ao menos é visto por todos os processos da mesma máquina
+# (o LocMemCache padrão não serve: a invalidação feita num worker não chegaria aos outros).
+#
+# Dois caches: "default" guarda poucas chaves de vida longa (sininho por usuário, painel
+# da fila, locations, métricas) e "fragmentos" o HTML das mensagens do chat, que cresce
+# com o uso. Separados, a limpeza (cull) dos fragmentos nunca derruba as chaves do default.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv('REDIS_URL'),
+        },
+        "fragmentos": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv('REDIS_URL'),
+            "KEY_PREFIX": "fragmentos",
+        },
+    }
+else:
+    CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+    CACHES = {
+        # O FileBasedCache lista a pasta a cada set() e, ao chegar em MAX_ENTRIES, apaga
+        # uma fração aleatória (1/CULL_FREQUENCY) das entradas: o limite precisa folgar
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.path.join(CACHE_DIR, 'default'),
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        },
+        "fragmentos": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.path.join(CACHE_DIR, 'fragmentos'),
+            "OPTIONS": {"MAX_ENTRIES": 20000, "CULL_FREQUENCY": 4},
+        },
+    }
+
+
 # AUTENTICAÇÃO E LOGIN
 
 AUTH_USER_MODEL = "tickets.Cliente"
@@ -190,9 +230,20 @@ MAXIMO_API_KEY = os.getenv('MAXIMO_API_KEY')
 
 MAXIMO_VERIFY_SSL = os.getenv('VERIFY', 'True').lower() == 'true'
 
-# Limite máximo do corpo da requisição (ex: 10MB)
-# O padrão é 2.5MB. Se você quer aceitar arquivos de 5MB + dados do form, ponha 10MB.
-DATA_UPLOAD_MAX_MEMORY_SIZE = 200 * 1024 * 1024  # 10 MB
+# Limite do corpo da requisição SEM contar arquivos (campos do formulário)
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
+
+# Uploads acima disso nunca ficam na RAM (padrão do Django: 2.5 MB)
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440
+
+# Anexos vão direto para um arquivo temporário, com o limite aplicado durante o
+# recebimento (ver tickets/uploads.py)
+FILE_UPLOAD_HANDLERS = ["tickets.uploads.AnexoUploadHandler"]
+
+# Tamanho máximo de um anexo (ticket ou chat)
+ANEXO_MAX_UPLOAD_SIZE = 150 * 1024 * 1024  # 150 MB
 
-# Limite máximo de um arquivo individual (ex: 5MB)
-FILE_UPLOAD_MAX_MEMORY_SIZE = 150 * 1024 * 1024   # 150 MB
\ No newline at end of file
+# Download de anexos: "python" (streaming pelo Django, padrão/desenvolvimento),
+# "x-accel" (nginx) ou "x-sendfile" (Apache). Ver tickets/downloads.py
+ANEXO_DOWNLOAD_MODO = os.getenv('ANEXO_DOWNLOAD_MODO', 'python')
+ANEXO_X_ACCEL_PREFIXO = os.getenv('ANEXO_X_ACCEL_PREFIXO', '/protegido/')
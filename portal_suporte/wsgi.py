@@ -5,6 +5,9 @@ It exposes the WSGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
+
+Serve todo o portal, exceto o stream de eventos (/eventos/), que vai para o ASGI
+(ver portal_suporte/asgi.py para o roteamento no proxy).
 """
 
 import os
@@ -1,6 +1,18 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Cliente, Ambiente, Area, Ticket, TicketInteracao, Notificacao
+from django.db.models import Q
+from .models import (
+    Cliente,
+    Ambiente,
+    Area,
+    Ticket,
+    TicketInteracao,
+    TicketStatusHistorico,
+    Notificacao,
+    ResumoDiarioTickets,
+    ResumoDiarioInteracoes,
+)
+from . import busca
 
 # Customização do Cabeçalho
 admin.site.site_header = "Portal de Suporte | Administração"
@@ -8,6 +20,30 @@ admin.site.site_title = "IT Consol Admin"
 admin.site.index_title = "Gestão de Utilizadores e Ativos"
 
 
+class BuscaTextualAdminMixin:
+    """
+    Busca do changelist via full-text indexado em `campo_busca_textual`, em vez de
+    icontains (que varre a tabela inteira). Com `campo_busca_cliente` a busca também
+    casa pelo username/nome do cliente ligado ao registro.
+    """
+
+    campo_busca_textual = "mensagem"
+    campo_busca_cliente = None
+
+    def get_search_results(self, request, queryset, search_term):
+        termo = search_term.strip()
+        if not termo:
+            return queryset, False
+
+        filtro = Q(_busca=busca._consulta(termo))
+        if self.campo_busca_cliente:
+            filtro |= Q(**{f"{self.campo_busca_cliente}_id__in": busca.ids_clientes(termo)})
+
+        # alias (e não annotate): o vetor só vai para o WHERE, onde casa com o índice
+        queryset = queryset.alias(_busca=busca.vetor_mensagem(self.campo_busca_textual))
+        return queryset.filter(filtro), False
+
+
 # --- INLINE: Chat dentro do Ticket ---
 class TicketInteracaoInline(admin.TabularInline):
     model = TicketInteracao
@@ -70,13 +106,9 @@ class TicketAdmin(admin.ModelAdmin):
         "data_criacao",
     )
     list_filter = ("status_maximo", "prioridade", "data_criacao", "area")
-    search_fields = (
-        "sumario",
-        "descricao",
-        "cliente__username",
-        "cliente__email",
-        "maximo_id",
-    )
+    # A busca em si é feita em get_search_results (mesmo filtro indexado da fila)
+    search_fields = ("maximo_id", "sumario")
+    search_help_text = "SR (ou parte dele), resumo, descrição, cliente ou e-mail exato."
 
     # PERFORMANCE: Evita queries duplicadas ao listar tickets
     list_select_related = ("cliente", "area", "ambiente")
@@ -90,6 +122,18 @@ class TicketAdmin(admin.ModelAdmin):
     ordering = ("-data_criacao",)
     inlines = [TicketInteracaoInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Troca os icontains padrão (com JOIN e sem índice em descricao) pelo filtro
+        da fila: full-text para palavras inteiras e trigram para fragmentos.
+        """
+        termo = search_term.strip()
+        if not termo:
+            return queryset, False
+
+        por_email = Cliente.objects.filter(email__iexact=termo).values_list("pk", flat=True)
+        return queryset.filter(busca.filtro(termo) | Q(cliente_id__in=list(por_email))), False
+
     fieldsets = (
         (
             "Dados do Chamado",
@@ -142,10 +186,12 @@ class AreaAdmin(admin.ModelAdmin):
 
 
 @admin.register(TicketInteracao)
-class TicketInteracaoAdmin(admin.ModelAdmin):
+class TicketInteracaoAdmin(BuscaTextualAdminMixin, admin.ModelAdmin):
     list_display = ("id", "ticket", "autor", "data_criacao", "tem_anexo")
     list_filter = ("data_criacao", "autor__username")
-    search_fields = ("mensagem", "ticket__sumario")
+    search_fields = ("mensagem",)
+    search_help_text = "Palavras da mensagem (aceita \"frase exata\" e -excluir) ou nome do autor."
+    campo_busca_cliente = "autor"
 
     # Performance
     list_select_related = ("ticket", "autor")
@@ -157,7 +203,62 @@ class TicketInteracaoAdmin(admin.ModelAdmin):
 
 # BÓNUS: Registar Notificações ajuda a debugar se o "sininho" não funcionar
 @admin.register(Notificacao)
-class NotificacaoAdmin(admin.ModelAdmin):
+class NotificacaoAdmin(BuscaTextualAdminMixin, admin.ModelAdmin):
     list_display = ("destinatario", "titulo", "lida", "data_criacao")
     list_filter = ("lida", "tipo")
-    search_fields = ("destinatario__username", "mensagem")
+    search_fields = ("mensagem",)
+    campo_busca_cliente = "destinatario"
+
+
+@admin.register(TicketStatusHistorico)
+class TicketStatusHistoricoAdmin(admin.ModelAdmin):
+    list_display = (
+        "ticket",
+        "status_anterior",
+        "status_novo",
+        "data",
+        "duracao_anterior",
+        "location",
+        "prioridade",
+    )
+    list_filter = ("status_novo", "prioridade", "data")
+    search_fields = ("ticket__maximo_id",)
+    date_hierarchy = "data"
+
+    list_select_related = ("ticket",)
+    raw_id_fields = ("ticket",)
+
+    # Somente inclusão: o histórico é gravado pelo sistema, nunca editado nem apagado à mão
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class ResumoDiarioAdminMixin:
+    """Rollups são gerados pelo atualizar_rollups: só leitura no admin."""
+
+    date_hierarchy = "dia"
+    ordering = ("-dia", "location")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ResumoDiarioTickets)
+class ResumoDiarioTicketsAdmin(ResumoDiarioAdminMixin, admin.ModelAdmin):
+    list_display = ("dia", "location", "status", "total", "criticos")
+    list_filter = ("status", "location")
+
+
+@admin.register(ResumoDiarioInteracoes)
+class ResumoDiarioInteracoesAdmin(ResumoDiarioAdminMixin, admin.ModelAdmin):
+    list_display = ("dia", "location", "total", "do_suporte")
+    list_filter = ("location",)
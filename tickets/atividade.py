@@ -0,0 +1,80 @@
+"""
+Contadores de atividade do chat guardados no próprio Ticket (desnormalizados):
+total_interacoes, ultima_interacao_em e ultima_interacao_suporte.
+
+Assim as listas mostram "N mensagens / última resposta" e filtram "aguardando
+resposta" pelo índice parcial, sem subquery nem N+1 em ticket_interacoes.
+
+Manutenção:
+- `registrar_interacao`: signal de post_save (criação), um UPDATE atômico com F().
+- `recalcular`: recalcula a partir da tabela de interações. Usar depois de
+  bulk_create, de ajustes de data (importar_logs_maximo) e ao apagar mensagens.
+"""
+
+from django.contrib.auth.models import Group
+from django.db.models import (
+    BooleanField,
+    Case,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from .models import Ticket, TicketInteracao
+
+
+def registrar_interacao(interacao: TicketInteracao):
+    """
+    Soma 1 ao contador e, se a mensagem for a mais recente, atualiza a "última".
+    Tudo no banco (sem ler o Ticket antes), então mensagens simultâneas não se perdem.
+    """
+    data = interacao.data_criacao
+    mais_recente = Q(ultima_interacao_em__isnull=True) | Q(ultima_interacao_em__lte=data)
+
+    Ticket.objects.filter(pk=interacao.ticket_id).update(
+        total_interacoes=F("total_interacoes") + 1,
+        ultima_interacao_em=Case(
+            When(mais_recente, then=Value(data)), default=F("ultima_interacao_em")
+        ),
+        ultima_interacao_suporte=Case(
+            When(mais_recente, then=Value(interacao.is_support)),
+            default=F("ultima_interacao_suporte"),
+        ),
+    )
+
+
+def expressao_autor_suporte():
+    """Mesmo critério de Cliente.is_support_team, em SQL: staff ou grupo Consultores."""
+    consultor = Group.objects.filter(name="Consultores", cliente_groups=OuterRef("autor"))
+    return ExpressionWrapper(
+        Q(autor__is_staff=True) | Q(Exists(consultor)), output_field=BooleanField()
+    )
+
+
+def recalcular(ticket_ids):
+    """Recalcula os contadores dos tickets informados num único UPDATE."""
+    interacoes = TicketInteracao.objects.filter(ticket=OuterRef("pk"))
+    ultima = interacoes.order_by("-data_criacao", "-pk")
+
+    total = (
+        interacoes.order_by()
+        .values("ticket")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+
+    return Ticket.objects.filter(pk__in=ticket_ids).update(
+        total_interacoes=Coalesce(Subquery(total, output_field=IntegerField()), 0),
+        ultima_interacao_em=Subquery(ultima.values("data_criacao")[:1]),
+        ultima_interacao_suporte=Subquery(
+            ultima.annotate(suporte=expressao_autor_suporte()).values("suporte")[:1]
+        ),
+    )
@@ -0,0 +1,149 @@
+"""
+Busca textual da fila de atendimento (PostgreSQL full-text search).
+
+Cada Ticket guarda em `busca` um tsvector com SR, resumo, descrição e os dados do
+cliente (nome/location), já com a configuração `portuguese_unaccent` (stemming em
+português, sem acentos). O índice GIN sobre a coluna deixa a busca em milissegundos.
+
+O vetor é mantido pelos signals (ver `signals.py`): ao salvar um Ticket ou um Cliente
+roda um único UPDATE. Carga inicial/reconstrução: migration 0021.
+
+Buscas parciais (pedaço do SR, do resumo ou do nome) usam índices pg_trgm (0022).
+
+Mensagens do chat e notificações não têm coluna própria: a busca do admin usa um
+índice GIN de expressão sobre `mensagem` (0023), ver `BuscaTextualAdminMixin`.
+"""
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import CharField, DecimalField, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Concat
+
+from .models import Ticket, Cliente, CONFIG_BUSCA
+
+# Campos do Ticket que entram no vetor: salvar só outros campos não reindexa
+CAMPOS_INDEXADOS = {"maximo_id", "sumario", "descricao", "cliente"}
+# Os mesmos, como atributos da instância (comparados no pre_save)
+ATRIBUTOS_INDEXADOS = ("maximo_id", "sumario", "descricao", "cliente_id")
+
+# Ordem dos resultados de busca (também usada pelo paginador por cursor)
+ORDENACAO_RELEVANCIA = ("-relevancia", "-data_criacao", "-id")
+
+# Termo muito genérico ("a") casaria com quase todos os clientes
+LIMITE_CLIENTES = 200
+
+
+def _texto_cliente(cliente: Cliente) -> str:
+    return " ".join(
+        filter(
+            None,
+            [cliente.username, cliente.first_name, cliente.last_name, cliente.location],
+        )
+    )
+
+
+def _texto_cliente_sql():
+    """
+    O mesmo texto de `_texto_cliente`, calculado no próprio UPDATE (subquery pelo
+    cliente_id; o Concat já trata NULL como ''): reindexar um ticket não precisa
+    carregar o Cliente.
+    """
+    espaco = Value(" ")
+    texto = Concat(
+        "username",
+        espaco,
+        "first_name",
+        espaco,
+        "last_name",
+        espaco,
+        "location",
+        output_field=CharField(),
+    )
+    return Subquery(
+        Cliente.objects.filter(pk=OuterRef("cliente_id")).values(texto=texto)[:1]
+    )
+
+
+def _vetor(texto_cliente):
+    """
+    Pesos: A = SR e resumo, B = cliente, C = descrição.
+    O texto do cliente vem pronto (Value ou subquery) porque UPDATE não faz JOIN no ORM.
+    """
+    return (
+        SearchVector("maximo_id", weight="A", config=CONFIG_BUSCA)
+        + SearchVector("sumario", weight="A", config=CONFIG_BUSCA)
+        + SearchVector(texto_cliente, weight="B", config=CONFIG_BUSCA)
+        + SearchVector("descricao", weight="C", config=CONFIG_BUSCA)
+    )
+
+
+def atualizar_ticket(ticket: Ticket):
+    """Recalcula o vetor de um ticket (um único UPDATE)."""
+    if connection.vendor != "postgresql":
+        return
+    Ticket.objects.filter(pk=ticket.pk).update(busca=_vetor(_texto_cliente_sql()))
+
+
+def atualizar_cliente(cliente: Cliente):
+    """O nome/location do cliente mudou: recalcula os vetores de todos os tickets dele."""
+    if connection.vendor != "postgresql":
+        return
+    Ticket.objects.filter(cliente=cliente).update(
+        busca=_vetor(Value(_texto_cliente(cliente)))
+    )
+
+
+def _consulta(termo: str) -> SearchQuery:
+    return SearchQuery(termo, config=CONFIG_BUSCA, search_type="websearch")
+
+
+def vetor_mensagem(campo: str = "mensagem") -> SearchVector:
+    """Precisa ser idêntica à expressão dos índices *_mensagem_fts, senão o índice não é usado."""
+    return SearchVector(campo, config=CONFIG_BUSCA)
+
+
+def ids_clientes(termo: str) -> list:
+    """
+    Clientes cujo username/nome contém o termo (índices trigram).
+    Resolvido antes, como lista de IDs (não subquery nem JOIN): assim cada ramo
+    de um OR é indexável e o PostgreSQL monta um BitmapOr em vez de varrer a tabela.
+    """
+    return list(
+        Cliente.objects.filter(
+            Q(username__icontains=termo)
+            | Q(first_name__icontains=termo)
+            | Q(last_name__icontains=termo)
+        ).values_list("pk", flat=True)[:LIMITE_CLIENTES]
+    )
+
+
+def filtro(termo: str) -> Q:
+    """
+    Palavras inteiras vêm do full-text; fragmentos ("SR12", meia palavra do resumo
+    ou do nome do cliente) vêm dos índices trigram (gin_trgm_ops sobre UPPER(),
+    que é exatamente o que o icontains gera no PostgreSQL).
+    """
+    return (
+        Q(busca=_consulta(termo))
+        | Q(maximo_id__icontains=termo)
+        | Q(sumario__icontains=termo)
+        | Q(cliente_id__in=ids_clientes(termo))
+    )
+
+
+def buscar(tickets, termo: str):
+    """
+    Filtra e ordena por relevância. Aceita a sintaxe de busca web:
+    "frase exata", -palavra, palavra OR outra.
+    """
+    # numeric (não float4) para a relevância poder ir num cursor de paginação e
+    # ser comparada de volta com igualdade exata
+    relevancia = Cast(
+        SearchRank(F("busca"), _consulta(termo)),
+        DecimalField(max_digits=20, decimal_places=8),
+    )
+    return (
+        tickets.filter(filtro(termo))
+        .annotate(relevancia=relevancia)
+        .order_by(*ORDENACAO_RELEVANCIA)
+    )
@@ -0,0 +1,197 @@
+"""
+Entrega de anexos depois da checagem de permissão feita na view.
+
+Em produção o Python não precisa passar os bytes: com ANEXO_DOWNLOAD_MODO
+"x-accel" (nginx) ou "x-sendfile" (Apache/lighttpd) a resposta é só um cabeçalho e o
+servidor web envia o arquivo, com suporte a Range (downloads retomáveis), sem
+ocupar um worker durante o download inteiro.
+
+Exemplo nginx (a location é interna: só acessível via X-Accel-Redirect):
+
+    location /protegido/ {
+        internal;
+        alias /caminho/do/MEDIA_ROOT/;
+    }
+
+Sem configuração ("python", o padrão, ex: em desenvolvimento) o arquivo é
+transmitido pelo próprio Django. Anexos comprimidos em disco (storage.py) sempre
+seguem por esse caminho, porque o servidor web entregaria os bytes comprimidos.
+
+No caminho "python" também há ETag/Last-Modified (download repetido vira 304) e
+Range de um intervalo (download interrompido continua de onde parou, 206).
+"""
+
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+MODOS_OFFLOAD = ("x-accel", "x-sendfile")
+
+
+def _modo() -> str:
+    return getattr(settings, "ANEXO_DOWNLOAD_MODO", "python")
+
+
+def _pode_delegar(anexo) -> bool:
+    storage = anexo.storage
+    if _modo() not in MODOS_OFFLOAD or not hasattr(storage, "path"):
+        return False
+    esta_comprimido = getattr(storage, "esta_comprimido", None)
+    return not (esta_comprimido and esta_comprimido(anexo.name))
+
+
+def _resposta_delegada(anexo, filename: str) -> HttpResponse:
+    """Resposta vazia: o servidor web lê o arquivo e preenche corpo, tamanho e Range."""
+    content_type, _ = mimetypes.guess_type(filename)
+    response = HttpResponse(content_type=content_type or "application/octet-stream")
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    if _modo() == "x-accel":
+        prefixo = getattr(settings, "ANEXO_X_ACCEL_PREFIXO", "/protegido/")
+        response["X-Accel-Redirect"] = prefixo + quote(anexo.name)
+    else:
+        # mod_xsendfile desfaz o %-encoding (XSendFileUnescape): nomes com acento
+        response["X-Sendfile"] = quote(anexo.storage.path(anexo.name))
+    return response
+
+
+# Só um intervalo ("bytes=inicio-fim", "bytes=inicio-" ou "bytes=-sufixo");
+# pedidos com vários intervalos recebem o arquivo inteiro (permitido pela RFC 9110)
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+TAMANHO_BLOCO = 64 * 1024
+
+
+def _validadores(anexo) -> tuple:
+    """
+    ETag forte no estilo do nginx (modificação + tamanho) e Last-Modified.
+    Os blobs nunca mudam de conteúdo (storage.py), então o par identifica a versão.
+    """
+    modificado = anexo.storage.get_modified_time(anexo.name)
+    tamanho = anexo.size
+    etag = f'"{int(modificado.timestamp()):x}-{tamanho:x}"'
+    return etag, modificado.timestamp(), tamanho
+
+
+def _intervalo(request, etag, modificado, tamanho):
+    """
+    (inicio, fim) pedido no Range, None para o arquivo inteiro, ou False se o
+    intervalo não existe no arquivo (416).
+    """
+    cabecalho = request.META.get("HTTP_RANGE", "")
+    casamento = RANGE_RE.match(cabecalho.strip())
+    if not casamento:
+        return None
+
+    # If-Range: só vale o Range se o cliente ainda tem a MESMA versão do arquivo
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range:
+        data = parse_http_date_safe(if_range)
+        if if_range != etag and (data is None or data < int(modificado)):
+            return None
+
+    inicio, fim = casamento.groups()
+    if not inicio:
+        if not fim or int(fim) == 0:
+            return False
+        inicio, fim = max(tamanho - int(fim), 0), tamanho - 1
+    else:
+        inicio = int(inicio)
+        fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio > fim or inicio >= tamanho:
+        return False
+    return inicio, fim
+
+
+def _bytes(anexo, inicio, fim):
+    """Lê [inicio, fim] em blocos. Arquivos comprimidos avançam descomprimindo."""
+    with anexo.open() as arquivo:
+        try:
+            arquivo.seek(inicio)
+        except (OSError, ValueError):
+            # Leitor sem seek: avança lendo e descartando
+            pulado = 0
+            while pulado < inicio:
+                bloco = arquivo.read(min(TAMANHO_BLOCO, inicio - pulado))
+                if not bloco:
+                    return
+                pulado += len(bloco)
+
+        restante = fim - inicio + 1
+        while restante > 0:
+            bloco = arquivo.read(min(TAMANHO_BLOCO, restante))
+            if not bloco:
+                break
+            restante -= len(bloco)
+            yield bloco
+
+
+def servir_anexo(request, anexo, filename: str) -> HttpResponse:
+    """
+    Responde com o arquivo de um FileField (já autorizado pela view).
+    Pode levantar FileNotFoundError se o arquivo não existir no disco.
+    """
+    if _pode_delegar(anexo):
+        return _resposta_delegada(anexo, filename)
+
+    etag, modificado, tamanho = _validadores(anexo)
+
+    # If-None-Match / If-Modified-Since: o cliente já tem essa versão -> 304
+    condicional = get_conditional_response(
+        request, etag=etag, last_modified=int(modificado)
+    )
+    if condicional is not None:
+        condicional["ETag"] = etag
+        return condicional
+
+    intervalo = _intervalo(request, etag, modificado, tamanho)
+    if intervalo is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{tamanho}"
+    elif intervalo:
+        inicio, fim = intervalo
+        content_type, _ = mimetypes.guess_type(filename)
+        response = StreamingHttpResponse(
+            _bytes(anexo, inicio, fim),
+            status=206,
+            content_type=content_type or "application/octet-stream",
+        )
+        response["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+        response["Content-Length"] = fim - inicio + 1
+        response["Content-Disposition"] = content_disposition_header(True, filename)
+    else:
+        # Retorna o arquivo como download (as_attachment=True)
+        response = FileResponse(anexo.open(), as_attachment=True, filename=filename)
+        # Anexos de texto ficam comprimidos em disco (storage.py) e são
+        # descomprimidos durante o envio: o tamanho informado é o original
+        response["Content-Length"] = tamanho
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(modificado)
+    # Anexos são privados: o navegador pode guardar (e revalidar), proxies não
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def servir_miniatura(request, miniatura) -> HttpResponse:
+    """
+    Prévia de imagem (miniaturas.py), exibida inline no chat. Pequena: sempre pelo
+    Django, com cache no navegador por um dia e revalidação por ETag.
+    """
+    etag, modificado, _ = _validadores(miniatura)
+    condicional = get_conditional_response(
+        request, etag=etag, last_modified=int(modificado)
+    )
+    if condicional is None:
+        content_type, _ = mimetypes.guess_type(miniatura.name)
+        response = FileResponse(miniatura.open(), content_type=content_type or "image/webp")
+        response["Last-Modified"] = http_date(modificado)
+    else:
+        response = condicional
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, max-age=86400"
+    return response
@@ -0,0 +1,136 @@
+"""
+Eventos em tempo real (Server-Sent Events) para o chat e o sininho.
+
+Publicação: os signals chamam `publicar()`. No PostgreSQL vira um NOTIFY no canal
+CANAL_EVENTOS, entregue após o commit, inclusive quando vem dos management commands
+(ex: importar_logs_maximo), que rodam em outro processo.
+
+Assinatura: cada processo ASGI mantém UMA conexão em LISTEN e distribui os eventos
+para as conexões SSE abertas através de filas asyncio.
+"""
+
+import asyncio
+import json
+import logging
+from django.conf import settings
+from django.db import connection, transaction
+
+try:
+    # psycopg 3: necessário apenas para o LISTEN assíncrono
+    import psycopg
+except ImportError:
+    psycopg = None
+
+logger = logging.getLogger(__name__)
+
+CANAL_EVENTOS = "portal_eventos"
+
+
+class Broadcaster:
+    """
+    Distribui eventos para as conexões SSE deste processo.
+    """
+
+    # Cliente lento não pode acumular memória indefinidamente
+    TAMANHO_FILA = 100
+
+    def __init__(self):
+        self.assinantes = set()
+        self.escutando = False
+        self._tarefa = None
+
+    def despachar(self, evento: dict):
+        """Entrega o evento a todos os assinantes (seguro a partir de qualquer thread)."""
+        for loop, fila in list(self.assinantes):
+            loop.call_soon_threadsafe(self._entregar, fila, evento)
+
+    @staticmethod
+    def _entregar(fila: asyncio.Queue, evento: dict):
+        try:
+            fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            pass
+
+    def assinar(self):
+        """Registra uma nova conexão SSE. Deve ser chamado dentro do event loop."""
+        inscricao = (asyncio.get_running_loop(), asyncio.Queue(self.TAMANHO_FILA))
+        self.assinantes.add(inscricao)
+        self._garantir_listener()
+        return inscricao
+
+    def cancelar(self, inscricao):
+        self.assinantes.discard(inscricao)
+
+    def _garantir_listener(self):
+        if psycopg is None or connection.vendor != "postgresql":
+            return
+        if self._tarefa is None or self._tarefa.done():
+            self._tarefa = asyncio.get_running_loop().create_task(self._escutar())
+
+    @staticmethod
+    def _conninfo() -> str:
+        db = settings.DATABASES["default"]
+        return psycopg.conninfo.make_conninfo(
+            dbname=db.get("NAME") or "",
+            user=db.get("USER") or "",
+            password=db.get("PASSWORD") or "",
+            host=db.get("HOST") or "",
+            port=db.get("PORT") or "",
+        )
+
+    async def _escutar(self):
+        """Mantém o LISTEN vivo, reconectando com pausa em caso de queda."""
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(
+                    self._conninfo(), autocommit=True
+                )
+                async with conn:
+                    await conn.execute(f"LISTEN {CANAL_EVENTOS}")
+                    self.escutando = True
+                    logger.info(f"SSE: escutando o canal '{CANAL_EVENTOS}'")
+
+                    async for notificacao in conn.notifies():
+                        try:
+                            self.despachar(json.loads(notificacao.payload))
+                        except ValueError:
+                            logger.warning(f"SSE: payload inválido: {notificacao.payload}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"SSE: conexão LISTEN caiu: {e}")
+            finally:
+                self.escutando = False
+
+            await asyncio.sleep(5)
+
+
+broadcaster = Broadcaster()
+
+
+def publicar(evento: dict):
+    """
+    Publica um evento após o commit da transação atual.
+    Payload deve ser pequeno (o NOTIFY aceita até ~8KB): mandamos só IDs.
+    """
+
+    def _enviar():
+        if connection.vendor == "postgresql":
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT pg_notify(%s, %s)", [CANAL_EVENTOS, json.dumps(evento)]
+                    )
+            except Exception as e:
+                logger.error(f"SSE: falha ao publicar evento {evento}: {e}")
+
+        # Sem LISTEN ativo neste processo, entrega direto aos assinantes locais
+        if not broadcaster.escutando:
+            broadcaster.despachar(evento)
+
+    transaction.on_commit(_enviar)
+
+
+def formatar_sse(evento: str, dados: dict) -> str:
+    """Formata uma mensagem no protocolo text/event-stream."""
+    return f"event: {evento}\ndata: {json.dumps(dados)}\n\n"
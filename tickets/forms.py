@@ -1,13 +1,28 @@
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm
 from django.core.exceptions import ValidationError
+from django.template.defaultfilters import filesizeformat
 from .models import Ambiente, Area, Ticket, TicketInteracao
+from .uploads import analisar, anexo_excedido, limite_anexo, mime_compativel
 import os
-import mimetypes
 
 # --- UTILITÁRIO DE VALIDAÇÃO (DRY & Segurança) ---
 
 
+def _erro_tamanho() -> str:
+    return f"O arquivo é muito grande. Máximo permitido: {filesizeformat(limite_anexo())}."
+
+
+def marcar_anexo_excedido(request, form):
+    """
+    Upload interrompido pelo AnexoUploadHandler (arquivo acima do limite): o arquivo
+    não chega ao request.FILES, então o erro é posto direto no campo do formulário.
+    """
+    campo = anexo_excedido(request)
+    if campo in form.fields:
+        form.add_error(campo, _erro_tamanho())
+
+
 def _validar_anexo_comum(arquivo):
     """
     Validação centralizada para uploads (Ticket e Chat).
@@ -16,12 +31,10 @@ def _validar_anexo_comum(arquivo):
     if not arquivo:
         return None
 
-    # 1. Validar tamanho (Limite: 150MB)
-    limit_mb = 150
-    if arquivo.size > limit_mb * 1024 * 1024:
-        raise ValidationError(
-            f"O arquivo é muito grande. Máximo permitido: {limit_mb}MB."
-        )
+    # 1. Validar tamanho (settings.ANEXO_MAX_UPLOAD_SIZE). Pelo upload handler um
+    # arquivo grande nem chega aqui (ver marcar_anexo_excedido); vale para os demais
+    if arquivo.size > limite_anexo():
+        raise ValidationError(_erro_tamanho())
 
     # 2. Validar extensão
     ext = os.path.splitext(arquivo.name)[1].lower()
@@ -48,34 +61,14 @@ def _validar_anexo_comum(arquivo):
             f"Arquivo '{ext}' não permitido. Use apenas PDF, Imagens, Word, zip..."
         )
 
-    # 3. Validação de MIME type (Segurança reforçada)
-    # Adivinha o tipo baseado no nome do ficheiro (não é perfeito, mas ajuda)
-    content_type_guess, _ = mimetypes.guess_type(arquivo.name)
-
-    # Lista de tipos seguros
-    allowed_mimes = [
-        "application/pdf",
-        "image/png",
-        "image/jpeg",
-        "text/plain",
-        "text/csv",
-        "application/vnd.ms-excel",
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        "application/msword",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "application/vnd.ms-powerpoint", 
-        "application/vnd.openxmlformats-officedocument.presentationml.presentation"
-    ]
-
-    if content_type_guess:
-        is_text = "text" in content_type_guess
-        is_valid = content_type_guess in allowed_mimes
-
-        if not (is_valid or is_text):
-            raise ValidationError(
-                f"Formato de arquivo inválido ({content_type_guess})."
-            )
-            # pass
+    # 3. Tipo real x extensão: o upload handler já detectou o tipo pelos primeiros
+    # bytes na mesma leitura que gravou o arquivo (não confia no nome nem no navegador)
+    analisar(arquivo)
+    if not mime_compativel(arquivo.name, arquivo.mime_detectado):
+        raise ValidationError(
+            f"O conteúdo do arquivo não corresponde à extensão '{ext}' "
+            f"({arquivo.mime_detectado})."
+        )
     return arquivo
 
 
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from tickets import rollups
+
+
+class Command(BaseCommand):
+    help = 'Atualiza os resumos diários (tickets e interações por dia/location) usados nos relatórios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true', help='Reconstrói todos os dias (ex: após apagar tickets ou mudar a location de clientes)')
+
+    def handle(self, *args, **options):
+        dias = rollups.atualizar(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(f"Resumos diários atualizados: {dias} dia(s) recalculado(s)."))
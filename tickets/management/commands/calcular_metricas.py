@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from tickets import metricas
+
+
+class Command(BaseCommand):
+    help = 'Atualiza as métricas de atendimento (percentis de SLA) usadas no painel da equipe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true', help='Recalcula do zero em vez de só os tickets alterados')
+
+    def handle(self, *args, **options):
+        resumo = metricas.calcular(completo=options['completo'])
+
+        if resumo['base_reconstruida'] and not options['completo']:
+            self.stdout.write(self.style.WARNING("Base não encontrada no cache: reconstruída do zero."))
+        self.stdout.write(
+            f"--- {resumo['total_tickets']} tickets na base, {resumo['tickets_relidos']} relidos do banco ---"
+        )
+        for titulo, valor in zip(metricas.METRICAS.values(), resumo['geral']):
+            if valor:
+                self.stdout.write(f"{titulo}: p50={valor['p50']}h p90={valor['p90']}h p99={valor['p99']}h (n={valor['n']})")
+            else:
+                self.stdout.write(f"{titulo}: sem dados")
+
+        self.stdout.write(self.style.SUCCESS("Métricas atualizadas."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from tickets import miniaturas
+from tickets.models import Ticket, TicketInteracao
+
+
+class Command(BaseCommand):
+    help = 'Gera as miniaturas (prévias) que faltam para anexos de imagem de tickets e do chat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=0, help='Máximo de anexos processados por modelo (0 = todos)')
+
+    def handle(self, *args, **options):
+        for modelo in (Ticket, TicketInteracao):
+            pendentes = miniaturas.pendentes(modelo).order_by('-pk').only('pk', 'anexo', 'miniatura')
+            if options['limite']:
+                pendentes = pendentes[:options['limite']]
+
+            geradas = falhas = 0
+            for obj in pendentes.iterator(chunk_size=200):
+                if miniaturas.gerar(obj):
+                    geradas += 1
+                else:
+                    falhas += 1
+
+            self.stdout.write(f"{modelo._meta.verbose_name_plural}: {geradas} geradas, {falhas} sem prévia")
+
+        self.stdout.write(self.style.SUCCESS("Miniaturas atualizadas."))
@@ -8,7 +8,8 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils.dateparse import parse_datetime
 from requests.adapters import HTTPAdapter, Retry
-from tickets.models import Ticket, TicketInteracao
+from tickets.models import EMAIL_USUARIO_INTEGRACAO, Ticket, TicketInteracao
+from tickets import atividade
 
 # 1. Silenciar erros de SSL e Avisos
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -73,6 +74,9 @@ class Command(BaseCommand):
                         count = self._processar_logs(ticket, worklogs, bot_user)
                         total_importado += count
                         if count > 0:
+                            # As datas foram ajustadas para o passado via update():
+                            # refaz os contadores de atividade a partir da tabela
+                            atividade.recalcular([ticket.pk])
                             self.stdout.write(f"Ticket #{ticket.maximo_id}: {count} novos logs.")
                 else:
                     # Aviso silencioso no log, não polui terminal
@@ -86,7 +90,7 @@ class Command(BaseCommand):
 
     def _get_system_user(self):
         """Cria ou recupera o usuário robô"""
-        email_bot = "maximo.integracao@itconsol.com"
+        email_bot = EMAIL_USUARIO_INTEGRACAO
         user, created = User.objects.get_or_create(
             email=email_bot,
             defaults={
@@ -0,0 +1,81 @@
+import logging
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tickets.models import Ticket, TicketInteracao
+from tickets.storage import PASTA_BLOBS, armazenamento_anexos
+
+logger = logging.getLogger(__name__)
+
+# Pastas onde os upload_to gravam os nomes (links) dos anexos e das miniaturas
+PASTAS_ANEXOS = ('tickets', 'miniaturas')
+
+
+class Command(BaseCommand):
+    help = 'Remove anexos que nenhum ticket/mensagem usa mais e os blobs deduplicados sem referências'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=int, default=24, help='Idade mínima (em horas) de um arquivo para ser removido (protege uploads em andamento)')
+        parser.add_argument('--deduplicar', action='store_true', help='Move para o armazenamento por conteúdo os anexos gravados antes dele')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas lista o que seria removido')
+
+    def handle(self, *args, **options):
+        storage = armazenamento_anexos()
+        limite = (timezone.now() - timedelta(hours=options['horas'])).timestamp()
+        dry_run = options['dry_run']
+
+        def antigo(info):
+            # ctime muda ao criar um link: um link novo para um blob antigo não é "antigo"
+            return max(info.st_mtime, info.st_ctime) < limite
+
+        # 1. Nomes em uso no banco
+        em_uso = set()
+        for modelo in (Ticket, TicketInteracao):
+            for campo in ('anexo', 'miniatura'):
+                em_uso.update(
+                    modelo.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True})
+                    .values_list(campo, flat=True).iterator(chunk_size=5000)
+                )
+        self.stdout.write(f"--- {len(em_uso)} anexos referenciados no banco ---")
+
+        # 2. Links que nenhum registro usa (ticket/mensagem apagados, anexo trocado)
+        links_removidos = 0
+        for pasta in PASTAS_ANEXOS:
+            for nome, info in list(storage.arquivos(pasta)):
+                if nome in em_uso or not antigo(info):
+                    continue
+                links_removidos += 1
+                if dry_run:
+                    self.stdout.write(f"[DRY-RUN] link sem uso: {nome}")
+                else:
+                    storage.delete(nome)
+
+        # Anexos antigos (arquivos comuns, st_nlink == 1) viram links para o blob
+        if options['deduplicar'] and not dry_run:
+            convertidos = 0
+            for pasta in PASTAS_ANEXOS:
+                for nome, info in list(storage.arquivos(pasta)):
+                    if nome in em_uso and info.st_nlink == 1:
+                        storage.deduplicar(nome)
+                        convertidos += 1
+            self.stdout.write(f"--- {convertidos} anexos antigos deduplicados ---")
+
+        # 3. Blobs sem nenhum link além do próprio (st_nlink == 1) e temporários esquecidos
+        blobs_removidos, bytes_liberados = 0, 0
+        for nome, info in list(storage.arquivos(PASTA_BLOBS)):
+            temporario = nome.startswith(f"{PASTA_BLOBS}/tmp/")
+            if not antigo(info) or (not temporario and info.st_nlink > 1):
+                continue
+            blobs_removidos += 1
+            bytes_liberados += info.st_size
+            if dry_run:
+                self.stdout.write(f"[DRY-RUN] blob sem referências: {nome}")
+            else:
+                storage.delete(nome)
+
+        resumo = f"{links_removidos} links e {blobs_removidos} blobs ({bytes_liberados / 1024 / 1024:.1f} MB)"
+        if dry_run:
+            self.stdout.write(f"[DRY-RUN] Seriam removidos {resumo}.")
+            return
+        logger.info(f"Limpeza de anexos: {resumo} removidos")
+        self.stdout.write(self.style.SUCCESS(f"--- Fim. Removidos {resumo} ---"))
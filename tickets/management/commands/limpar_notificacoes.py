@@ -0,0 +1,55 @@
+import logging
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tickets.models import Notificacao
+from tickets.services import NotificationService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Remove notificações já lidas mais antigas que N dias (em lotes, sem travar a tabela)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=90, help='Idade mínima (em dias) das notificações lidas a remover')
+        parser.add_argument('--lote', type=int, default=1000, help='Quantidade de linhas apagadas por DELETE')
+        parser.add_argument('--pausa', type=float, default=0.1, help='Segundos de espera entre lotes (alivia o banco)')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta o que seria removido')
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+
+        # Usa o índice parcial 'notif_lidas_data_idx'. Notificações não lidas nunca são apagadas.
+        antigas = Notificacao.objects.filter(lida=True, data_criacao__lt=limite)
+
+        if options['dry_run']:
+            self.stdout.write(f"[DRY-RUN] {antigas.count()} notificações seriam removidas (lidas antes de {limite:%d/%m/%Y}).")
+            return
+
+        self.stdout.write(f"--- Limpando notificações lidas antes de {limite:%d/%m/%Y} ---")
+
+        total_removido = 0
+        destinatarios = set()
+        while True:
+            # Cada lote é um DELETE curto por PK: locks rápidos, sem bloquear o sininho dos usuários
+            lote = list(antigas.order_by('data_criacao').values_list('pk', 'destinatario_id')[:options['lote']])
+            if not lote:
+                break
+
+            # _raw_delete: um único DELETE ... WHERE id IN (...), sem carregar as linhas nem
+            # disparar post_delete por linha (nada aponta para Notificacao)
+            qs_lote = Notificacao.objects.filter(pk__in=[pk for pk, _ in lote])
+            total_removido += qs_lote._raw_delete(qs_lote.db)
+            destinatarios.update(destinatario for _, destinatario in lote)
+
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        # Só lidas foram apagadas (fora do resumo do sininho), mas invalidamos uma vez
+        # por destinatário no lugar do post_delete que o _raw_delete não dispara
+        NotificationService.invalidar_cache(*destinatarios)
+
+        logger.info(f"Limpeza de notificações: {total_removido} removidas")
+        self.stdout.write(self.style.SUCCESS(f"--- Fim. Total removido: {total_removido} ---"))
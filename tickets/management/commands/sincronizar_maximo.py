@@ -2,7 +2,10 @@ import requests
 import logging
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from tickets.models import Ticket, MAXIMO_STATUS_CHOICES
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from tickets.models import Ticket, TicketStatusHistorico, MAXIMO_STATUS_CHOICES
 from requests.adapters import HTTPAdapter, Retry
 
 # Configuração de Log
@@ -65,12 +68,25 @@ class Command(BaseCommand):
             logger.error(f"Erro na sincronização: {e}")
             self.stdout.write(self.style.ERROR(f"Erro Crítico: {e}"))
 
+    @transaction.atomic
     def processar_tickets(self, items: list) -> None:
+        # Uma transação: os status salvos no loop e o histórico gravado no final entram
+        # juntos. Se algo falhar no meio, nada fica salvo sem o seu histórico (a próxima
+        # execução refaz a rodada).
         total_vinculados = 0
         total_status_alterados = 0
         
+        # Mudanças de status desta rodada, gravadas de uma vez no final
+        self.historico = []
+
         # 1. Carrega tickets locais (exclui fechados)
-        tickets_locais = Ticket.objects.exclude(status_maximo__in=['CLOSED', 'CANCELLED'])
+        # Junto: location do cliente e a data da última mudança de status (para o histórico)
+        ultima_mudanca = TicketStatusHistorico.objects.filter(ticket=OuterRef("pk")).order_by("-data")
+        tickets_locais = (
+            Ticket.objects.exclude(status_maximo__in=['CLOSED', 'CANCELLED'])
+            .select_related("cliente")
+            .annotate(ultima_mudanca_status=Subquery(ultima_mudanca.values("data")[:1]))
+        )
         
         self.stdout.write(f"Tickets locais carregados para verificação: {tickets_locais.count()}")
 
@@ -148,6 +164,10 @@ class Command(BaseCommand):
                     total_status_alterados += 1
                     self.stdout.write(f"Ticket #{ticket.id} [ATUALIZADO] -> Status: {mx_status} (SR {mx_id})")
 
+        # Histórico de status em lote (uma query em vez de um INSERT por mudança)
+        if self.historico:
+            TicketStatusHistorico.objects.bulk_create(self.historico, batch_size=500)
+
         # Resumo Final
         msg_final = f"Sincronização concluída. Novos Vínculos: {total_vinculados} | Status Alterados: {total_status_alterados}"
         
@@ -160,7 +180,8 @@ class Command(BaseCommand):
         """Salva apenas o ID no banco."""
         logger.info(f"VINCULO: Ticket Local #{ticket.id} agora ligado ao Maximo ID {novo_maximo_id}")
         ticket.maximo_id = novo_maximo_id
-        ticket.save(update_fields=['maximo_id'])
+        ticket.data_vinculo_maximo = timezone.now()
+        ticket.save(update_fields=['maximo_id', 'data_vinculo_maximo', 'data_atualizacao'])
 
     def _atualizar_ticket(self, ticket: Ticket, novo_status: str, maximo_id: str) -> bool:
         """
@@ -172,6 +193,7 @@ class Command(BaseCommand):
         # Verifica ID (redundância de segurança caso não tenha vindo do _vincular_id)
         if ticket.maximo_id != maximo_id:
             ticket.maximo_id = maximo_id
+            ticket.data_vinculo_maximo = ticket.data_vinculo_maximo or timezone.now()
             alterou = True
 
         # Verifica Status
@@ -180,12 +202,25 @@ class Command(BaseCommand):
             status_valido = any(choice[0] == novo_status for choice in MAXIMO_STATUS_CHOICES)
             
             if status_valido:
+                status_anterior = ticket.status_maximo
                 ticket.status_maximo = novo_status
                 alterou = True
+
+                self.historico.append(
+                    TicketStatusHistorico.registrar(
+                        ticket, status_anterior, desde=ticket.ultima_mudanca_status
+                    )
+                )
+                # O signal de pre_save não grava de novo (vai no bulk_create do final)
+                ticket._historico_em_lote = True
             else:
                 logger.warning(f"Status desconhecido recebido do Maximo: '{novo_status}' para ticket #{ticket.id}. Ignorado.")
 
         if alterou:
-            ticket.save()
+            # Só os campos da sincronização: um save completo regravaria os contadores
+            # de atividade (total_interacoes etc.) com valores lidos antes do loop
+            ticket.save(
+                update_fields=["maximo_id", "data_vinculo_maximo", "status_maximo", "data_atualizacao"]
+            )
         
         return alterou
\ No newline at end of file
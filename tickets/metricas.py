@@ -0,0 +1,282 @@
+"""
+Métricas de atendimento (SLA) para o painel da equipe e o comando calcular_metricas.
+
+Por ticket: tempo até o vínculo com o Maximo, até a 1ª resposta do suporte e até
+resolver. Os dados vêm do banco como colunas (values_list) e viram arrays NumPy;
+os percentis (p50/p90/p99) por location, área e prioridade são calculados de forma
+vetorizada, sem laço por ticket.
+
+Quem calcula é só o comando `calcular_metricas` (agendado); o painel mostra o
+último resumo gravado, nunca recalcula dentro do request.
+
+Incremental: a base por ticket fica no cache com marcas d'água (último
+data_atualizacao, último ID do histórico de status e das interações). Cada novo
+cálculo relê do banco só os tickets que mudaram desde então e descarta os que foram
+apagados. As colunas de texto (location, área) vão para o cache como códigos
+inteiros + rótulos, para a base não crescer com o tamanho dos textos. Se a base
+sumir do cache, o comando reconstrói do zero. `--completo` força a reconstrução
+(ex: após mudar a location de clientes).
+
+1ª resposta do suporte: mensagens do usuário de integração (logs importados do
+Maximo) não contam, só as de pessoas da equipe.
+"""
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Max, OuterRef, Subquery
+from django.utils import timezone
+
+from .atividade import expressao_autor_suporte
+from .models import EMAIL_USUARIO_INTEGRACAO, Ticket, TicketInteracao, TicketStatusHistorico
+
+METRICAS = {
+    "vinculo": "Até o vínculo com o Maximo",
+    "primeira_resposta": "Até a 1ª resposta do suporte",
+    "resolucao": "Até resolver",
+}
+DIMENSOES = {"location": "Location", "area": "Área", "prioridade": "Prioridade"}
+PERCENTIS = (50, 90, 99)
+
+# Entrada num destes status conta como "resolvido" (a primeira vez)
+STATUS_RESOLVIDO = ("RESOLVED", "CLOSED")
+
+CACHE_CHAVE_BASE = "metricas:base"
+CACHE_CHAVE_RESUMO = "metricas:resumo"
+
+_COLUNAS_DATA = ("criacao", "vinculo", "resposta", "resolucao")
+_COLUNAS_GRUPO = ("location", "area", "prioridade")
+
+
+def _segundos(datas) -> np.ndarray:
+    """datetimes (ou None) -> epoch em float64, com NaN para "ainda não aconteceu"."""
+    return np.fromiter(
+        (d.timestamp() if d is not None else np.nan for d in datas),
+        dtype=np.float64,
+        count=len(datas),
+    )
+
+
+def _respostas_suporte():
+    """Mensagens da equipe de suporte, sem as do usuário de integração."""
+    return (
+        TicketInteracao.objects.alias(suporte=expressao_autor_suporte())
+        .filter(suporte=True)
+        .exclude(autor__email=EMAIL_USUARIO_INTEGRACAO)
+    )
+
+
+def _carregar(ticket_ids=None) -> dict:
+    """Lê os tickets (todos, ou só `ticket_ids`) como colunas NumPy, ordenadas por ID."""
+    primeira_resposta = (
+        _respostas_suporte()
+        .filter(ticket=OuterRef("pk"))
+        .order_by("data_criacao")
+        .values("data_criacao")[:1]
+    )
+    resolucao = (
+        TicketStatusHistorico.objects.filter(
+            ticket=OuterRef("pk"), status_novo__in=STATUS_RESOLVIDO
+        )
+        .order_by("data")
+        .values("data")[:1]
+    )
+
+    tickets = Ticket.objects.order_by("pk")
+    if ticket_ids is not None:
+        tickets = tickets.filter(pk__in=ticket_ids)
+
+    linhas = list(
+        tickets.annotate(
+            primeira_resposta=Subquery(primeira_resposta),
+            resolvido_em=Subquery(resolucao),
+        ).values_list(
+            "pk",
+            "data_criacao",
+            "data_vinculo_maximo",
+            "primeira_resposta",
+            "resolvido_em",
+            "cliente__location",
+            "area__nome_area",
+            "prioridade",
+        )
+    )
+    colunas = list(zip(*linhas)) or [()] * 8
+
+    base = {"ids": np.array(colunas[0], dtype=np.int64)}
+    for nome, valores in zip(_COLUNAS_DATA, colunas[1:5]):
+        base[nome] = _segundos(valores)
+    for nome, valores in zip(_COLUNAS_GRUPO, colunas[5:8]):
+        base[nome] = np.array([v or "" for v in valores], dtype=str)
+    return base
+
+
+def _marcas() -> dict:
+    """Marcas d'água atuais; lidas ANTES dos dados (no pior caso, relê algo a mais)."""
+    return {
+        "ticket": Ticket.objects.aggregate(m=Max("data_atualizacao"))["m"],
+        "historico": TicketStatusHistorico.objects.aggregate(m=Max("pk"))["m"] or 0,
+        "interacao": TicketInteracao.objects.aggregate(m=Max("pk"))["m"] or 0,
+    }
+
+
+def _ids_alterados(marcas: dict) -> set:
+    ids = set(
+        TicketStatusHistorico.objects.filter(pk__gt=marcas["historico"]).values_list(
+            "ticket_id", flat=True
+        )
+    )
+    ids.update(
+        _respostas_suporte()
+        .filter(pk__gt=marcas["interacao"])
+        .values_list("ticket_id", flat=True)
+    )
+    if marcas["ticket"] is not None:
+        ids.update(
+            Ticket.objects.filter(data_atualizacao__gt=marcas["ticket"]).values_list(
+                "pk", flat=True
+            )
+        )
+    return ids
+
+
+def _mesclar(base: dict, novos: dict) -> dict:
+    """Troca/insere as linhas de `novos` em `base`, mantendo a ordem por ID."""
+    manter = ~np.isin(base["ids"], novos["ids"])
+    juntos = {
+        nome: np.concatenate([base[nome][manter], novos[nome]]) for nome in novos
+    }
+    ordem = np.argsort(juntos["ids"], kind="stable")
+    return {nome: valores[ordem] for nome, valores in juntos.items()}
+
+
+def _sem_apagados(base: dict) -> dict:
+    """Remove da base os tickets que não existem mais no banco."""
+    existentes = np.fromiter(
+        Ticket.objects.values_list("pk", flat=True).iterator(), dtype=np.int64
+    )
+    manter = np.isin(base["ids"], existentes)
+    if manter.all():
+        return base
+    return {nome: valores[manter] for nome, valores in base.items()}
+
+
+def _compactar(base: dict) -> dict:
+    """Colunas de texto -> (rótulos, códigos int32): bem menor para guardar no cache."""
+    compacta = dict(base)
+    for nome in _COLUNAS_GRUPO:
+        rotulos, codigos = np.unique(base[nome], return_inverse=True)
+        compacta[nome] = (rotulos.tolist(), codigos.astype(np.int32))
+    return compacta
+
+
+def _expandir(compacta: dict) -> dict:
+    base = dict(compacta)
+    for nome in _COLUNAS_GRUPO:
+        rotulos, codigos = compacta[nome]
+        base[nome] = np.array(rotulos, dtype=str)[codigos]
+    return base
+
+
+def _percentis_por_grupo(chaves: np.ndarray, valores: np.ndarray) -> dict:
+    """
+    p50/p90/p99 de `valores` para cada grupo de `chaves`, todos de uma vez:
+    ordena por (grupo, valor) e interpola nas posições de cada percentil dentro do
+    bloco do grupo (mesmo resultado do np.percentile linear).
+    """
+    validos = ~np.isnan(valores)
+    chaves, valores = chaves[validos], valores[validos]
+    if not len(valores):
+        return {}
+
+    rotulos, grupo = np.unique(chaves, return_inverse=True)
+    ordem = np.lexsort((valores, grupo))
+    valores, grupo = valores[ordem], grupo[ordem]
+
+    inicio = np.searchsorted(grupo, np.arange(len(rotulos)))
+    tamanho = np.diff(np.append(inicio, len(valores)))
+
+    # posições (grupos x percentis) dentro do array ordenado
+    q = np.array(PERCENTIS, dtype=np.float64) / 100
+    posicao = inicio[:, None] + q[None, :] * (tamanho[:, None] - 1)
+    abaixo = np.floor(posicao).astype(np.int64)
+    acima = np.ceil(posicao).astype(np.int64)
+    fracao = posicao - abaixo
+    resultado = valores[abaixo] + (valores[acima] - valores[abaixo]) * fracao
+
+    horas = np.round(resultado / 3600, 1)
+    return {
+        rotulo or "(sem)": {
+            "n": int(n),
+            **{f"p{p}": float(h) for p, h in zip(PERCENTIS, linha)},
+        }
+        for rotulo, n, linha in zip(rotulos.tolist(), tamanho, horas)
+    }
+
+
+def _resumir(base: dict) -> dict:
+    inicio = base["criacao"]
+    # Logs importados podem ter data anterior à abertura no portal: conta como zero.
+    # (np.maximum mantém o NaN de "ainda não aconteceu")
+    duracoes = {
+        "vinculo": np.maximum(base["vinculo"] - inicio, 0),
+        "primeira_resposta": np.maximum(base["resposta"] - inicio, 0),
+        "resolucao": np.maximum(base["resolucao"] - inicio, 0),
+    }
+
+    todos = np.full(len(base["ids"]), "geral")
+    geral = {
+        metrica: _percentis_por_grupo(todos, valores).get("geral")
+        for metrica, valores in duracoes.items()
+    }
+
+    # Por dimensão: uma linha por grupo, com as métricas na ordem de METRICAS
+    por = {}
+    for dimensao in DIMENSOES:
+        por_metrica = {
+            metrica: _percentis_por_grupo(base[dimensao], valores)
+            for metrica, valores in duracoes.items()
+        }
+        grupos = sorted(set().union(*por_metrica.values()))
+        por[dimensao] = [
+            {"grupo": grupo, "metricas": [por_metrica[m].get(grupo) for m in METRICAS]}
+            for grupo in grupos
+        ]
+
+    return {
+        "gerado_em": timezone.now(),
+        "total_tickets": int(len(base["ids"])),
+        "geral": [geral[m] for m in METRICAS],
+        "por": por,
+    }
+
+
+def calcular(completo: bool = False) -> dict:
+    """
+    Atualiza a base (incremental, ou do zero com `completo` ou se ela sumiu do
+    cache) e grava o resumo do painel. Chamado pelo comando calcular_metricas.
+    """
+    estado = None if completo else cache.get(CACHE_CHAVE_BASE)
+    marcas = _marcas()
+
+    if estado is None:
+        base = _carregar()
+        relidos = len(base["ids"])
+    else:
+        ids = _ids_alterados(estado["marcas"])
+        base = _sem_apagados(_expandir(estado["base"]))
+        if ids:
+            base = _mesclar(base, _carregar(ids))
+        relidos = len(ids)
+
+    cache.set(CACHE_CHAVE_BASE, {"base": _compactar(base), "marcas": marcas}, None)
+
+    resumo = _resumir(base)
+    resumo["tickets_relidos"] = relidos
+    resumo["base_reconstruida"] = estado is None
+    cache.set(CACHE_CHAVE_RESUMO, resumo, None)
+    return resumo
+
+
+def resumo():
+    """Último resumo gravado pelo calcular_metricas, ou None se ainda não rodou."""
+    return cache.get(CACHE_CHAVE_RESUMO)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0018_ticket_tickets_cliente_f1989d_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notificacao",
+            index=models.Index(
+                condition=models.Q(("lida", False)),
+                fields=["destinatario", "data_criacao"],
+                name="notif_nao_lidas_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notificacao",
+            index=models.Index(
+                condition=models.Q(("lida", True)),
+                fields=["data_criacao"],
+                name="notif_lidas_data_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0019_notificacao_notif_nao_lidas_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ticketinteracao",
+            index=models.Index(
+                fields=["ticket", "data_criacao", "id"],
+                name="ticket_inte_ticket__fd38ab_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+# Mesma configuração 'portuguese', mas removendo acentos antes do stemming
+# ("manutenção" e "manutencao" geram o mesmo lexema)
+CRIAR_CONFIG = """
+CREATE TEXT SEARCH CONFIGURATION portuguese_unaccent (COPY = portuguese);
+ALTER TEXT SEARCH CONFIGURATION portuguese_unaccent
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+"""
+
+REMOVER_CONFIG = "DROP TEXT SEARCH CONFIGURATION IF EXISTS portuguese_unaccent;"
+
+# Carga inicial; daqui para frente quem mantém é tickets/busca.py (mesmos pesos)
+PREENCHER_BUSCA = """
+UPDATE tickets t SET busca =
+    setweight(to_tsvector('portuguese_unaccent', coalesce(t.maximo_id, '')), 'A')
+    || setweight(to_tsvector('portuguese_unaccent', coalesce(t.sumario, '')), 'A')
+    || setweight(to_tsvector('portuguese_unaccent', concat_ws(' ',
+           c.username, c.first_name, c.last_name, c.location)), 'B')
+    || setweight(to_tsvector('portuguese_unaccent', coalesce(t.descricao, '')), 'C')
+FROM clientes c
+WHERE c.id = t.cliente_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0020_ticketinteracao_ticket_inte_ticket__fd38ab_idx"),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.RunSQL(CRIAR_CONFIG, REMOVER_CONFIG),
+        migrations.AddField(
+            model_name="ticket",
+            name="busca",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunSQL(PREENCHER_BUSCA, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["busca"], name="ticket_busca_gin"
+            ),
+        ),
+    ]
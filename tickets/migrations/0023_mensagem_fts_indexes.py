@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:55
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0022_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notificacao",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector(
+                    "mensagem", config="portuguese_unaccent"
+                ),
+                name="notif_mensagem_fts",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ticketinteracao",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector(
+                    "mensagem", config="portuguese_unaccent"
+                ),
+                name="interacao_mensagem_fts",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0023_mensagem_fts_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                fields=["data_criacao", "id"], name="ticket_data_id_idx"
+            ),
+        ),
+    ]
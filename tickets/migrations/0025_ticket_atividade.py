@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+# Carga inicial dos contadores; daqui para frente quem mantém é tickets/atividade.py
+# (suporte = staff ou grupo Consultores, como Cliente.is_support_team)
+PREENCHER_ATIVIDADE = """
+UPDATE tickets t SET
+    total_interacoes = a.total,
+    ultima_interacao_em = a.data_criacao,
+    ultima_interacao_suporte = a.suporte
+FROM (
+    SELECT DISTINCT ON (i.ticket_id)
+        i.ticket_id,
+        i.data_criacao,
+        COUNT(*) OVER (PARTITION BY i.ticket_id) AS total,
+        (c.is_staff OR EXISTS (
+            SELECT 1 FROM clientes_groups cg
+            JOIN auth_group g ON g.id = cg.group_id
+            WHERE cg.cliente_id = c.id AND g.name = 'Consultores'
+        )) AS suporte
+    FROM ticket_interacoes i
+    JOIN clientes c ON c.id = i.autor_id
+    ORDER BY i.ticket_id, i.data_criacao DESC, i.id DESC
+) a
+WHERE a.ticket_id = t.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0024_ticket_ticket_data_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ticket",
+            name="total_interacoes",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="ticket",
+            name="ultima_interacao_em",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="ticket",
+            name="ultima_interacao_suporte",
+            field=models.BooleanField(
+                editable=False, null=True, verbose_name="Última mensagem do suporte?"
+            ),
+        ),
+        migrations.RunSQL(PREENCHER_ATIVIDADE, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                condition=models.Q(
+                    ("ultima_interacao_suporte", False),
+                    models.Q(("status_maximo__in", ("CLOSED", "CANCELLED")), _negated=True),
+                ),
+                fields=["ultima_interacao_em", "id"],
+                name="ticket_aguardando_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0025_ticket_atividade"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TicketStatusHistorico",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status_anterior",
+                    models.CharField(
+                        choices=[
+                            ("NEW", "Novo"),
+                            ("QUEUED", "Em fila"),
+                            ("INPROG", "Em Andamento"),
+                            ("PENDING", "Pendente"),
+                            ("APPR", "Aprovado"),
+                            ("APPFML", "Aprovado pelo Gerenciador de Cumprimento"),
+                            ("APPLM", "Aprovado pelo Gerente de Linha"),
+                            ("RESOLVED", "Resolvido"),
+                            ("CLOSED", "Fechado"),
+                            ("CANCELLED", "Cancelado"),
+                            ("REJECTED", "Rejeitado"),
+                            ("DRAFT", "Rascunho"),
+                            ("HISTEDIT", "Editado no Histórico"),
+                            ("TSTCLI", "Teste do cliente"),
+                            ("TSTCLIOK", "Teste do cliente OK"),
+                            ("TSTCLIFAIL", "Teste do cliente falhou"),
+                            ("IMPPRODOK", "Implementação em produção OK"),
+                            ("AGREUN", "Reunião Agendada"),
+                            ("CRITFAIL", "Falha Crítica"),
+                            ("ROLLBACK", "Rollback"),
+                            ("TREINAMTO", "Treinamento"),
+                            ("DOC", "Documentar"),
+                            ("SLAHOLD", "Espera de SLA"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status_novo",
+                    models.CharField(
+                        choices=[
+                            ("NEW", "Novo"),
+                            ("QUEUED", "Em fila"),
+                            ("INPROG", "Em Andamento"),
+                            ("PENDING", "Pendente"),
+                            ("APPR", "Aprovado"),
+                            ("APPFML", "Aprovado pelo Gerenciador de Cumprimento"),
+                            ("APPLM", "Aprovado pelo Gerente de Linha"),
+                            ("RESOLVED", "Resolvido"),
+                            ("CLOSED", "Fechado"),
+                            ("CANCELLED", "Cancelado"),
+                            ("REJECTED", "Rejeitado"),
+                            ("DRAFT", "Rascunho"),
+                            ("HISTEDIT", "Editado no Histórico"),
+                            ("TSTCLI", "Teste do cliente"),
+                            ("TSTCLIOK", "Teste do cliente OK"),
+                            ("TSTCLIFAIL", "Teste do cliente falhou"),
+                            ("IMPPRODOK", "Implementação em produção OK"),
+                            ("AGREUN", "Reunião Agendada"),
+                            ("CRITFAIL", "Falha Crítica"),
+                            ("ROLLBACK", "Rollback"),
+                            ("TREINAMTO", "Treinamento"),
+                            ("DOC", "Documentar"),
+                            ("SLAHOLD", "Espera de SLA"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "data",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Mudou em"
+                    ),
+                ),
+                (
+                    "duracao_anterior",
+                    models.DurationField(
+                        blank=True, null=True, verbose_name="Tempo no status anterior"
+                    ),
+                ),
+                ("location", models.CharField(blank=True, max_length=200, null=True)),
+                (
+                    "prioridade",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("", "Selecione..."),
+                            ("1", "1 - Crítica"),
+                            ("2", "2 - Alta"),
+                            ("3", "3 - Média"),
+                            ("4", "4 - Baixa"),
+                            ("5", "5 - Sem Prioridade"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                (
+                    "ticket",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="historico_status",
+                        to="tickets.ticket",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Histórico de Status",
+                "verbose_name_plural": "Históricos de Status",
+                "db_table": "ticket_status_historico",
+                "ordering": ["data"],
+                "indexes": [
+                    models.Index(
+                        fields=["ticket", "data"], name="ticket_stat_ticket__ad9f83_idx"
+                    ),
+                    models.Index(
+                        fields=["status_anterior", "data"],
+                        name="ticket_stat_status__52e349_idx",
+                    ),
+                    models.Index(
+                        fields=["location", "status_anterior"],
+                        name="ticket_stat_locatio_7c4e2f_idx",
+                    ),
+                    models.Index(
+                        fields=["prioridade", "status_anterior"],
+                        name="ticket_stat_priorid_c7adf6_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
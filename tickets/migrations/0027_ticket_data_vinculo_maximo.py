@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0026_ticketstatushistorico"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ticket",
+            name="data_vinculo_maximo",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Vinculado ao Maximo em",
+            ),
+        ),
+    ]
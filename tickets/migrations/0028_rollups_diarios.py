@@ -0,0 +1,126 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0027_ticket_data_vinculo_maximo"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ControleRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("nome", models.CharField(max_length=50, unique=True)),
+                ("ultima_execucao", models.DateTimeField(blank=True, null=True)),
+                ("ultimo_id_interacao", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "db_table": "controle_rollup",
+            },
+        ),
+        migrations.CreateModel(
+            name="ResumoDiarioInteracoes",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("dia", models.DateField()),
+                ("location", models.CharField(blank=True, default="", max_length=200)),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("do_suporte", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Resumo Diário de Interações",
+                "verbose_name_plural": "Resumos Diários de Interações",
+                "db_table": "resumo_diario_interacoes",
+            },
+        ),
+        migrations.CreateModel(
+            name="ResumoDiarioTickets",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("dia", models.DateField()),
+                ("location", models.CharField(blank=True, default="", max_length=200)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("NEW", "Novo"),
+                            ("QUEUED", "Em fila"),
+                            ("INPROG", "Em Andamento"),
+                            ("PENDING", "Pendente"),
+                            ("APPR", "Aprovado"),
+                            ("APPFML", "Aprovado pelo Gerenciador de Cumprimento"),
+                            ("APPLM", "Aprovado pelo Gerente de Linha"),
+                            ("RESOLVED", "Resolvido"),
+                            ("CLOSED", "Fechado"),
+                            ("CANCELLED", "Cancelado"),
+                            ("REJECTED", "Rejeitado"),
+                            ("DRAFT", "Rascunho"),
+                            ("HISTEDIT", "Editado no Histórico"),
+                            ("TSTCLI", "Teste do cliente"),
+                            ("TSTCLIOK", "Teste do cliente OK"),
+                            ("TSTCLIFAIL", "Teste do cliente falhou"),
+                            ("IMPPRODOK", "Implementação em produção OK"),
+                            ("AGREUN", "Reunião Agendada"),
+                            ("CRITFAIL", "Falha Crítica"),
+                            ("ROLLBACK", "Rollback"),
+                            ("TREINAMTO", "Treinamento"),
+                            ("DOC", "Documentar"),
+                            ("SLAHOLD", "Espera de SLA"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("criticos", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Resumo Diário de Tickets",
+                "verbose_name_plural": "Resumos Diários de Tickets",
+                "db_table": "resumo_diario_tickets",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="ticketinteracao",
+            index=models.Index(fields=["data_criacao"], name="interacao_data_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="resumodiariointeracoes",
+            constraint=models.UniqueConstraint(
+                fields=("dia", "location"), name="resumo_interacoes_unico"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="resumodiariotickets",
+            constraint=models.UniqueConstraint(
+                fields=("dia", "location", "status"), name="resumo_tickets_unico"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:40
+
+import tickets.models
+import tickets.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0028_rollups_diarios"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="ticket",
+            name="anexo",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                storage=tickets.storage.armazenamento_anexos,
+                upload_to=tickets.models.ticket_upload_path,
+                verbose_name="Anexo",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="ticketinteracao",
+            name="anexo",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                storage=tickets.storage.armazenamento_anexos,
+                upload_to=tickets.models.interacao_upload_path,
+                verbose_name="Anexo (Opcional)",
+            ),
+        ),
+    ]
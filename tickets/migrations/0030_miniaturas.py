@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:20
+
+import tickets.models
+import tickets.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0029_anexos_deduplicados"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ticket",
+            name="miniatura",
+            field=models.ImageField(
+                blank=True,
+                editable=False,
+                null=True,
+                storage=tickets.storage.armazenamento_anexos,
+                upload_to=tickets.models.miniatura_upload_path,
+            ),
+        ),
+        migrations.AddField(
+            model_name="ticketinteracao",
+            name="miniatura",
+            field=models.ImageField(
+                blank=True,
+                editable=False,
+                null=True,
+                storage=tickets.storage.armazenamento_anexos,
+                upload_to=tickets.models.miniatura_upload_path,
+            ),
+        ),
+    ]
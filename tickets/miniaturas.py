@@ -0,0 +1,117 @@
+"""
+Miniaturas (prévias) dos anexos de imagem do ticket e do chat.
+
+Um print de tela pode ter dezenas de MB; o chat mostra uma miniatura WebP de poucos
+KB e o arquivo original só é baixado se o usuário clicar. A miniatura é gerada em
+segundo plano (agendada pelo signal depois do commit), para não atrasar o envio da
+mensagem. Uma única thread por processo atende a fila: uma rajada de prints de
+tela não vira dezenas de decodificações simultâneas. O comando `gerar_miniaturas`
+cobre anexos antigos e falhas.
+
+Só PNG/JPEG (os formatos de imagem aceitos no upload). Imagens acima de
+LIMITE_PIXELS (bomba de descompressão) são recusadas antes de decodificar.
+"""
+
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+EXTENSOES_IMAGEM = (".png", ".jpg", ".jpeg")
+TAMANHO_MAXIMO = (480, 480)
+QUALIDADE = 80
+
+# ~ 8000 x 8000: acima disso não é um print de tela. Conferido aqui, antes de
+# decodificar, e não no Image.MAX_IMAGE_PIXELS (global do Pillow, que só recusa
+# acima do dobro e vale também para o admin e os ImageField)
+LIMITE_PIXELS = 64_000_000
+
+# Gera uma miniatura por vez em cada processo; as demais esperam na fila
+_fila = ThreadPoolExecutor(max_workers=1, thread_name_prefix="miniaturas")
+
+
+def eh_imagem(nome: str) -> bool:
+    return os.path.splitext(nome or "")[1].lower() in EXTENSOES_IMAGEM
+
+
+def pendentes(modelo):
+    """Registros com anexo de imagem e ainda sem miniatura."""
+    imagem = Q()
+    for ext in EXTENSOES_IMAGEM:
+        imagem |= Q(anexo__iendswith=ext)
+    return modelo.objects.filter(imagem).filter(
+        Q(miniatura="") | Q(miniatura__isnull=True)
+    )
+
+
+def _renderizar(arquivo) -> tuple:
+    """(bytes, extensão) da miniatura: WebP, ou JPEG se o Pillow não tiver WebP."""
+    with Image.open(arquivo, formats=["PNG", "JPEG"]) as imagem:
+        # JPEG: decodifica já reduzido (bem mais rápido para fotos grandes)
+        imagem.draft("RGB", TAMANHO_MAXIMO)
+        # Só o cabeçalho foi lido até aqui; o tamanho já considera o draft do JPEG
+        if imagem.width * imagem.height > LIMITE_PIXELS:
+            raise Image.DecompressionBombError(
+                f"{imagem.width}x{imagem.height} pixels (limite {LIMITE_PIXELS})"
+            )
+        # Reduz antes de girar: a rotação da orientação EXIF fica sobre a miniatura,
+        # não sobre a foto inteira (o limite é quadrado, girar não o ultrapassa)
+        imagem.thumbnail(TAMANHO_MAXIMO)
+        imagem = ImageOps.exif_transpose(imagem)
+
+        saida = io.BytesIO()
+        if features.check("webp"):
+            if imagem.mode not in ("RGB", "RGBA"):
+                imagem = imagem.convert("RGBA")
+            imagem.save(saida, "WEBP", quality=QUALIDADE, method=4)
+            return saida.getvalue(), "webp"
+
+        imagem.convert("RGB").save(saida, "JPEG", quality=QUALIDADE, optimize=True)
+        return saida.getvalue(), "jpg"
+
+
+def gerar(obj) -> bool:
+    """Gera e salva a miniatura de um Ticket ou TicketInteracao. True se gerou."""
+    if not obj.anexo or not eh_imagem(obj.anexo.name):
+        return False
+    try:
+        with obj.anexo.open("rb") as arquivo:
+            conteudo, ext = _renderizar(arquivo)
+    except (OSError, Image.DecompressionBombError) as e:
+        # Imagem corrompida, truncada ou grande demais: fica sem prévia
+        logger.warning(f"Miniatura não gerada ({obj._meta.model_name} {obj.pk}): {e}")
+        return False
+
+    nome = f"{obj._meta.model_name}_{obj.pk}.{ext}"
+    obj.miniatura.save(nome, ContentFile(conteudo), save=False)
+    # update_fields: não mexe no resto do registro; no chat, o signal de post_save
+    # descarta o HTML em cache da mensagem, que passa a mostrar a prévia
+    obj.save(update_fields=["miniatura"])
+    return True
+
+
+def _gerar_em_segundo_plano(modelo, pk):
+    try:
+        obj = modelo.objects.filter(pk=pk).first()
+        if obj is not None:
+            gerar(obj)
+    except Exception as e:
+        logger.error(f"Erro ao gerar miniatura ({modelo._meta.model_name} {pk}): {e}")
+    finally:
+        connection.close()  # conexão própria da thread da fila
+
+
+def agendar(obj):
+    """Põe a miniatura na fila depois do commit (o arquivo e a linha já existem)."""
+    if not obj.anexo or not eh_imagem(obj.anexo.name):
+        return
+    modelo, pk = type(obj), obj.pk
+    transaction.on_commit(lambda: _fila.submit(_gerar_em_segundo_plano, modelo, pk))
+
@@ -1,8 +1,12 @@
 import os
 import uuid
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
+from .storage import armazenamento_anexos
 
 
 def ticket_upload_path(instance, filename):
@@ -26,6 +30,12 @@ def interacao_upload_path(instance, filename):
     return f"tickets/{ticket_id}/chat/{filename}"
 
 
+def miniatura_upload_path(instance, filename):
+    """Prévias dos anexos de imagem: miniaturas/ANO/MES/modelo_ID.webp"""
+    today = timezone.now()
+    return f"miniaturas/{today.year}/{today.month}/{filename}"
+
+
 # --- CONSTANTES DE STATUS (Limpeza Visual) ---
 MAXIMO_STATUS_CHOICES = [
     ("NEW", "Novo"),
@@ -53,6 +63,9 @@ MAXIMO_STATUS_CHOICES = [
     ("SLAHOLD", "Espera de SLA"),
 ]
 
+# Status em que o ticket não conta mais como "em aberto"
+STATUS_ENCERRADOS = ("CLOSED", "CANCELLED")
+
 PRIORIDADE_CHOICES = [
     ("", "Selecione..."),
     ("1", "1 - Crítica"),
@@ -63,6 +76,13 @@ PRIORIDADE_CHOICES = [
 ]
 
 
+# Configuração de full-text (criada na migration 0021): português, sem acentos
+CONFIG_BUSCA = "portuguese_unaccent"
+
+# Usuário robô do importar_logs_maximo (is_staff): autor dos logs vindos do Maximo
+EMAIL_USUARIO_INTEGRACAO = "maximo.integracao@itconsol.com"
+
+
 # --- MODELS ---
 
 
@@ -80,6 +100,22 @@ class Cliente(AbstractUser):
 
     class Meta:
         db_table = "clientes"
+        # Busca parcial por nome (fila e admin): icontains vira UPPER(campo) LIKE,
+        # que só um índice trigram sobre UPPER(campo) consegue atender
+        indexes = [
+            GinIndex(
+                OpClass(Upper("username"), name="gin_trgm_ops"),
+                name="cliente_username_trgm",
+            ),
+            GinIndex(
+                OpClass(Upper("first_name"), name="gin_trgm_ops"),
+                name="cliente_first_name_trgm",
+            ),
+            GinIndex(
+                OpClass(Upper("last_name"), name="gin_trgm_ops"),
+                name="cliente_last_name_trgm",
+            ),
+        ]
 
     @property
     def is_consultor(self):
@@ -133,6 +169,11 @@ class Ticket(models.Model):
         db_index=True,
     )
 
+    # Quando o sincronizar_maximo ligou o ticket a uma SR (métrica "tempo até vínculo")
+    data_vinculo_maximo = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name="Vinculado ao Maximo em"
+    )
+
     status_maximo = models.CharField(
         max_length=20,
         default="NEW",
@@ -150,7 +191,19 @@ class Ticket(models.Model):
 
     # MELHORIA: upload_to usa função para organizar pastas
     anexo = models.FileField(
-        upload_to=ticket_upload_path, null=True, blank=True, verbose_name="Anexo"
+        upload_to=ticket_upload_path,
+        storage=armazenamento_anexos,  # deduplicado por conteúdo (storage.py)
+        null=True,
+        blank=True,
+        verbose_name="Anexo",
+    )
+    # Prévia de anexo de imagem, gerada em segundo plano (miniaturas.py)
+    miniatura = models.ImageField(
+        upload_to=miniatura_upload_path,
+        storage=armazenamento_anexos,
+        null=True,
+        blank=True,
+        editable=False,
     )
 
     # Auditoria
@@ -159,6 +212,16 @@ class Ticket(models.Model):
         auto_now=True, verbose_name="Última atualização"
     )
 
+    # Atividade do chat, desnormalizada (mantido por tickets/atividade.py)
+    total_interacoes = models.PositiveIntegerField(default=0, editable=False)
+    ultima_interacao_em = models.DateTimeField(null=True, blank=True, editable=False)
+    ultima_interacao_suporte = models.BooleanField(
+        null=True, editable=False, verbose_name="Última mensagem do suporte?"
+    )
+
+    # Busca textual da fila (mantido por tickets/busca.py)
+    busca = SearchVectorField(null=True, editable=False)
+
     class Meta:
         ordering = ["-data_criacao"]
         db_table = "tickets"
@@ -167,11 +230,39 @@ class Ticket(models.Model):
         indexes = [
             models.Index(fields=['cliente', 'data_criacao']),
             models.Index(fields=['status_maximo']),
+            # Paginação por cursor da fila (-data_criacao, -id)
+            models.Index(fields=["data_criacao", "id"], name="ticket_data_id_idx"),
+            # "Aguardando resposta": cliente falou por último e o ticket segue aberto.
+            # Parcial, ordenado pela espera (mais antigo primeiro)
+            models.Index(
+                fields=["ultima_interacao_em", "id"],
+                condition=models.Q(ultima_interacao_suporte=False)
+                & ~models.Q(status_maximo__in=STATUS_ENCERRADOS),
+                name="ticket_aguardando_idx",
+            ),
+            GinIndex(fields=["busca"], name="ticket_busca_gin"),
+            # Fragmentos ("SR12", parte do resumo) via icontains
+            GinIndex(
+                OpClass(Upper("maximo_id"), name="gin_trgm_ops"),
+                name="ticket_maximo_id_trgm",
+            ),
+            GinIndex(
+                OpClass(Upper("sumario"), name="gin_trgm_ops"),
+                name="ticket_sumario_trgm",
+            ),
         ]
 
     def __str__(self):
         return f"Ticket #{self.id} - {self.sumario}"
 
+    @property
+    def aguardando_resposta(self):
+        """Última mensagem foi do cliente e o ticket segue aberto."""
+        return (
+            self.ultima_interacao_suporte is False
+            and self.status_maximo not in STATUS_ENCERRADOS
+        )
+
     @property
     def badge_class(self):
         """Retorna a classe CSS do Bootstrap para o status."""
@@ -209,10 +300,18 @@ class TicketInteracao(models.Model):
     # MELHORIA: upload_to organizado
     anexo = models.FileField(
         upload_to=interacao_upload_path,
+        storage=armazenamento_anexos,
         null=True,
         blank=True,
         verbose_name="Anexo (Opcional)",
     )
+    miniatura = models.ImageField(
+        upload_to=miniatura_upload_path,
+        storage=armazenamento_anexos,
+        null=True,
+        blank=True,
+        editable=False,
+    )
     data_criacao = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -220,6 +319,18 @@ class TicketInteracao(models.Model):
         db_table = "ticket_interacoes"
         verbose_name = "Interação"
         verbose_name_plural = "Interações"
+        indexes = [
+            # Paginação do chat por (data_criacao, id) dentro do ticket (?before=)
+            models.Index(fields=["ticket", "data_criacao", "id"]),
+            # Busca no histórico (admin): índice de expressão, sem coluna extra.
+            # A consulta precisa usar a MESMA expressão (busca.vetor_mensagem)
+            GinIndex(
+                SearchVector("mensagem", config=CONFIG_BUSCA),
+                name="interacao_mensagem_fts",
+            ),
+            # Faixas de datas (atualizar_rollups)
+            models.Index(fields=["data_criacao"], name="interacao_data_idx"),
+        ]
 
     def __str__(self):
         return f"Msg de {self.autor.username} em {self.ticket.id}"
@@ -254,6 +365,65 @@ class TicketInteracao(models.Model):
         return f"{name[:30]}...{name[-7:]}"
 
 
+class TicketStatusHistorico(models.Model):
+    """
+    Histórico das mudanças de status (somente inclusão). Cada linha registra quanto
+    tempo o ticket ficou no status anterior, então "tempo em cada status" por ticket,
+    location ou prioridade é um SUM/AVG(duracao_anterior) com GROUP BY, sem reconstruir
+    nada pela API do Maximo.
+    """
+
+    ticket = models.ForeignKey(
+        Ticket, on_delete=models.CASCADE, related_name="historico_status"
+    )
+    status_anterior = models.CharField(max_length=20, choices=MAXIMO_STATUS_CHOICES)
+    status_novo = models.CharField(max_length=20, choices=MAXIMO_STATUS_CHOICES)
+    data = models.DateTimeField(default=timezone.now, verbose_name="Mudou em")
+    duracao_anterior = models.DurationField(
+        null=True, blank=True, verbose_name="Tempo no status anterior"
+    )
+
+    # Copiados do ticket/cliente no momento da mudança (agrupamentos sem JOIN)
+    location = models.CharField(max_length=200, blank=True, null=True)
+    prioridade = models.CharField(max_length=2, choices=PRIORIDADE_CHOICES, blank=True)
+
+    class Meta:
+        ordering = ["data"]
+        db_table = "ticket_status_historico"
+        verbose_name = "Histórico de Status"
+        verbose_name_plural = "Históricos de Status"
+        indexes = [
+            # Linha do tempo de um ticket / última mudança (cálculo da duração)
+            models.Index(fields=["ticket", "data"]),
+            # Tempo em cada status num período
+            models.Index(fields=["status_anterior", "data"]),
+            models.Index(fields=["location", "status_anterior"]),
+            models.Index(fields=["prioridade", "status_anterior"]),
+        ]
+
+    def __str__(self):
+        return f"Ticket #{self.ticket_id}: {self.status_anterior} -> {self.status_novo}"
+
+    @classmethod
+    def registrar(cls, ticket: Ticket, status_anterior: str, desde=None, data=None):
+        """
+        Monta (sem salvar) a linha da mudança de `status_anterior` para o status atual
+        do ticket. `desde` é quando o ticket entrou no status anterior (última mudança
+        ou a abertura). Salvar em lote com bulk_create.
+        """
+        data = data or timezone.now()
+        desde = desde or ticket.data_criacao
+        return cls(
+            ticket=ticket,
+            status_anterior=status_anterior,
+            status_novo=ticket.status_maximo,
+            data=data,
+            duracao_anterior=data - desde if desde else None,
+            location=ticket.cliente.location,
+            prioridade=ticket.prioridade,
+        )
+
+
 class Notificacao(models.Model):
     TIPO_CHOICES = (
         ("mensagem", "Nova Mensagem"),
@@ -276,6 +446,90 @@ class Notificacao(models.Model):
 
     class Meta:
         ordering = ["-data_criacao"]
+        indexes = [
+            # Sininho (toda página): não lidas do usuário, ordenadas por data.
+            # Parcial: só indexa as não lidas, então continua pequeno.
+            models.Index(
+                fields=["destinatario", "data_criacao"],
+                condition=models.Q(lida=False),
+                name="notif_nao_lidas_idx",
+            ),
+            # Limpeza periódica (limpar_notificacoes): lidas mais antigas que N dias
+            models.Index(
+                fields=["data_criacao"],
+                condition=models.Q(lida=True),
+                name="notif_lidas_data_idx",
+            ),
+            # Busca no admin (mesma expressão de busca.vetor_mensagem)
+            GinIndex(
+                SearchVector("mensagem", config=CONFIG_BUSCA),
+                name="notif_mensagem_fts",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.titulo} - {self.destinatario}"
+
+
+# --- ROLLUPS (relatórios) ---
+# Agregados por dia mantidos pelo comando atualizar_rollups: painéis e exportações
+# leem estas tabelas pequenas em vez de varrer tickets/ticket_interacoes.
+
+
+class ResumoDiarioTickets(models.Model):
+    """Tickets abertos no dia, por location do cliente e status atual."""
+
+    dia = models.DateField()
+    location = models.CharField(max_length=200, blank=True, default="")
+    status = models.CharField(max_length=20, choices=MAXIMO_STATUS_CHOICES)
+    total = models.PositiveIntegerField(default=0)
+    criticos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "resumo_diario_tickets"
+        verbose_name = "Resumo Diário de Tickets"
+        verbose_name_plural = "Resumos Diários de Tickets"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dia", "location", "status"], name="resumo_tickets_unico"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.location} {self.status}: {self.total}"
+
+
+class ResumoDiarioInteracoes(models.Model):
+    """Mensagens do chat no dia, por location do cliente do ticket."""
+
+    dia = models.DateField()
+    location = models.CharField(max_length=200, blank=True, default="")
+    total = models.PositiveIntegerField(default=0)
+    do_suporte = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "resumo_diario_interacoes"
+        verbose_name = "Resumo Diário de Interações"
+        verbose_name_plural = "Resumos Diários de Interações"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dia", "location"], name="resumo_interacoes_unico"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.location}: {self.total}"
+
+
+class ControleRollup(models.Model):
+    """Até onde o atualizar_rollups já processou (para recalcular só o que mudou)."""
+
+    nome = models.CharField(max_length=50, unique=True)
+    ultima_execucao = models.DateTimeField(null=True, blank=True)
+    ultimo_id_interacao = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "controle_rollup"
+
+    def __str__(self):
+        return f"{self.nome} ({self.ultima_execucao})"
@@ -0,0 +1,184 @@
+"""
+Paginação por cursor (keyset) para as listas de tickets.
+
+O Paginator do Django faz COUNT(*) e OFFSET: a página 500 lê (e descarta) todas as
+anteriores. Aqui a página seguinte parte do último registro exibido
+("data_criacao < X, ou igual a X com id < Y"), então qualquer página custa o
+mesmo que a primeira, usando o índice da ordenação.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+from django.db import connection
+from django.db.models import Q
+
+# Até aqui o rodapé mostra o total exato; acima, a estimativa do planner
+LIMITE_CONTAGEM_EXATA = 1000
+
+
+class PaginaCursor:
+    """Uma página de resultados, com os cursores para a anterior e a seguinte."""
+
+    def __init__(self, itens, proximo_cursor, cursor_anterior, paginador):
+        self.object_list = itens
+        self.proximo_cursor = proximo_cursor
+        self.cursor_anterior = cursor_anterior
+        self.paginador = paginador
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.proximo_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def total(self):
+        return self.paginador.total()
+
+
+class PaginadorCursor:
+    """
+    `ordenacao` são campos (ou anotações) no formato do order_by, ex:
+    ("-data_criacao", "-id"). O último deve ser único para desempatar.
+    """
+
+    def __init__(self, queryset, por_pagina, ordenacao=("-data_criacao", "-id")):
+        self.queryset = queryset
+        self.por_pagina = por_pagina
+        self.ordenacao = ordenacao
+        self._total = None
+
+    # --- Cursor: base64 de JSON com os valores da ordenação + direção ---
+
+    @staticmethod
+    def _serializar(valor):
+        # isoformat mantém os microssegundos (o DjangoJSONEncoder corta), senão o
+        # "igual a X" do keyset nunca bate
+        if isinstance(valor, datetime):
+            return valor.isoformat()
+        if isinstance(valor, Decimal):
+            return str(valor)
+        return valor
+
+    def _codificar(self, item, direcao):
+        valores = [
+            self._serializar(getattr(item, campo.lstrip("-"))) for campo in self.ordenacao
+        ]
+        dados = json.dumps({"v": valores, "d": direcao}).encode()
+        return base64.urlsafe_b64encode(dados).decode().rstrip("=")
+
+    def _decodificar(self, cursor):
+        try:
+            dados = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            valores, direcao = dados["v"], dados["d"]
+        except (ValueError, KeyError, TypeError, binascii.Error):
+            return None, None
+        if len(valores) != len(self.ordenacao) or direcao not in ("proxima", "anterior"):
+            return None, None
+        return valores, direcao
+
+    def _filtro_keyset(self, valores, depois: bool) -> Q:
+        """
+        (a, b) depois de (x, y) na ordenação: a > x OR (a = x AND b > y), com o
+        sentido de cada comparação invertido para campos descendentes.
+        """
+        filtro = Q()
+        iguais = {}
+        for campo, valor in zip(self.ordenacao, valores):
+            nome = campo.lstrip("-")
+            descendente = campo.startswith("-")
+            operador = "lt" if descendente == depois else "gt"
+            filtro |= Q(**iguais, **{f"{nome}__{operador}": valor})
+            iguais[nome] = valor
+
+        # Limite redundante no 1º campo: é ele que vira faixa de índice (o OR sozinho não)
+        primeiro = self.ordenacao[0]
+        operador = "lte" if primeiro.startswith("-") == depois else "gte"
+        return Q(**{f"{primeiro.lstrip('-')}__{operador}": valores[0]}) & filtro
+
+    @staticmethod
+    def _inverter(campo):
+        return campo[1:] if campo.startswith("-") else f"-{campo}"
+
+    def get_page(self, cursor=None) -> PaginaCursor:
+        """Cursor ausente ou inválido cai na primeira página (como o Paginator.get_page)."""
+        valores, direcao = self._decodificar(cursor) if cursor else (None, None)
+
+        qs = self.queryset
+        if direcao == "anterior":
+            # Volta lendo na ordem inversa a partir do cursor e depois desinverte
+            qs = qs.filter(self._filtro_keyset(valores, depois=False)).order_by(
+                *[self._inverter(campo) for campo in self.ordenacao]
+            )
+        else:
+            if valores is not None:
+                qs = qs.filter(self._filtro_keyset(valores, depois=True))
+            qs = qs.order_by(*self.ordenacao)
+
+        # Um a mais só para saber se existe outra página naquele sentido
+        itens = list(qs[: self.por_pagina + 1])
+        tem_mais = len(itens) > self.por_pagina
+        itens = itens[: self.por_pagina]
+
+        if direcao == "anterior":
+            itens.reverse()
+            tem_anterior, tem_proxima = tem_mais, True
+        else:
+            tem_anterior, tem_proxima = valores is not None, tem_mais
+
+        if not itens:
+            return PaginaCursor([], None, None, self)
+
+        return PaginaCursor(
+            itens,
+            self._codificar(itens[-1], "proxima") if tem_proxima else None,
+            self._codificar(itens[0], "anterior") if tem_anterior else None,
+            self,
+        )
+
+    def _estimativa(self) -> int:
+        """Linhas estimadas pelo planner (EXPLAIN), sem executar a consulta."""
+        sql, params = self.queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plano = cursor.fetchone()[0]
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        return int(plano[0]["Plan"]["Plan Rows"])
+
+    def total(self) -> dict:
+        """
+        Total para o rodapé: {"valor", "exato", "limite"}. Opcional: só é
+        calculado se o template pedir (ex: meus_tickets com ?total=1).
+
+        COUNT limitado a LIMITE_CONTAGEM_EXATA + 1 linhas (custo fixo, nunca varre a
+        tabela): abaixo disso o valor é exato. Acima, usa a estimativa do planner
+        (EXPLAIN) só se ela for coerente com o que já foi contado; a estimativa de
+        um filtro seletivo (ex: tickets de um cliente) pode errar por ordens de
+        grandeza, e aí valor=None ("mais de {limite}").
+        """
+        if self._total is None:
+            qs = self.queryset.order_by()
+            contados = qs[: LIMITE_CONTAGEM_EXATA + 1].count()
+            total = {"valor": contados, "exato": True, "limite": LIMITE_CONTAGEM_EXATA}
+            if contados > LIMITE_CONTAGEM_EXATA:
+                estimativa = self._estimativa() if connection.vendor == "postgresql" else 0
+                total["exato"] = False
+                total["valor"] = estimativa if estimativa > LIMITE_CONTAGEM_EXATA else None
+            self._total = total
+        return self._total
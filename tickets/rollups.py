@@ -0,0 +1,167 @@
+"""
+Rollups diários para relatórios de volume (ResumoDiarioTickets / ResumoDiarioInteracoes).
+
+"Quantos tickets por dia, por location e status" vira uma leitura de algumas
+centenas de linhas agregadas, em vez de varrer tickets e ticket_interacoes.
+
+Incremental: o ControleRollup guarda a última execução e o último ID de interação
+processado. Cada execução recalcula só os dias "tocados" desde então: o dia de
+abertura dos tickets alterados (data_atualizacao) e o dia das interações novas.
+Cada dia é apagado e refeito inteiro numa transação, então rodar de novo é seguro.
+
+Não são detectados: tickets/mensagens apagados e mudança de location do cliente.
+Para esses casos, `atualizar_rollups --completo` reconstrói tudo.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .atividade import expressao_autor_suporte
+from .models import (
+    ControleRollup,
+    ResumoDiarioInteracoes,
+    ResumoDiarioTickets,
+    Ticket,
+    TicketInteracao,
+)
+
+CONTROLE = "diario"
+
+# Dias recalculados por transação
+TAMANHO_LOTE = 31
+
+
+def _faixa(dias):
+    """Início do primeiro e fim do último dia (fuso local): filtro que usa o índice."""
+    inicio = timezone.make_aware(datetime.combine(min(dias), time.min))
+    fim = timezone.make_aware(datetime.combine(max(dias) + timedelta(days=1), time.min))
+    return inicio, fim
+
+
+def _por_dia(queryset, dias=None):
+    """Anota o dia (no fuso local) e, se informado, restringe aos `dias`."""
+    if dias is not None:
+        inicio, fim = _faixa(dias)
+        queryset = queryset.filter(data_criacao__gte=inicio, data_criacao__lt=fim)
+    queryset = queryset.annotate(dia=TruncDate("data_criacao"))
+    if dias is not None:
+        queryset = queryset.filter(dia__in=dias)
+    return queryset
+
+
+def _dias(tickets, interacoes) -> set:
+    dias = set(_por_dia(tickets).order_by().values_list("dia", flat=True).distinct())
+    dias.update(_por_dia(interacoes).order_by().values_list("dia", flat=True).distinct())
+    return dias
+
+
+def _linhas_tickets(dias):
+    agregado = (
+        _por_dia(Ticket.objects.all(), dias)
+        .order_by()
+        .values("dia", "cliente__location", "status_maximo")
+        .annotate(total=Count("pk"), criticos=Count("pk", filter=Q(prioridade="1")))
+    )
+    return [
+        ResumoDiarioTickets(
+            dia=linha["dia"],
+            location=linha["cliente__location"] or "",
+            status=linha["status_maximo"],
+            total=linha["total"],
+            criticos=linha["criticos"],
+        )
+        for linha in agregado
+    ]
+
+
+def _linhas_interacoes(dias):
+    agregado = (
+        _por_dia(TicketInteracao.objects.all(), dias)
+        .alias(suporte=expressao_autor_suporte())
+        .order_by()
+        .values("dia", "ticket__cliente__location")
+        .annotate(total=Count("pk"), do_suporte=Count("pk", filter=Q(suporte=True)))
+    )
+    return [
+        ResumoDiarioInteracoes(
+            dia=linha["dia"],
+            location=linha["ticket__cliente__location"] or "",
+            total=linha["total"],
+            do_suporte=linha["do_suporte"],
+        )
+        for linha in agregado
+    ]
+
+
+def recalcular_dias(dias) -> int:
+    """Apaga e refaz os rollups dos `dias`, em lotes de TAMANHO_LOTE dias."""
+    dias = sorted(dias)
+    for i in range(0, len(dias), TAMANHO_LOTE):
+        lote = dias[i : i + TAMANHO_LOTE]
+        with transaction.atomic():
+            ResumoDiarioTickets.objects.filter(dia__in=lote).delete()
+            ResumoDiarioInteracoes.objects.filter(dia__in=lote).delete()
+            ResumoDiarioTickets.objects.bulk_create(_linhas_tickets(lote))
+            ResumoDiarioInteracoes.objects.bulk_create(_linhas_interacoes(lote))
+    return len(dias)
+
+
+def atualizar(completo: bool = False) -> int:
+    """
+    Recalcula os dias alterados desde a última execução (ou todos, com `completo`
+    ou na primeira vez). Retorna quantos dias foram recalculados.
+    """
+    controle, _ = ControleRollup.objects.get_or_create(nome=CONTROLE)
+
+    # Marcas lidas ANTES dos dados: o que mudar durante a execução entra na próxima
+    inicio = timezone.now()
+    ultimo_id = TicketInteracao.objects.aggregate(m=Max("pk"))["m"] or 0
+
+    if completo or controle.ultima_execucao is None:
+        dias = _dias(Ticket.objects.all(), TicketInteracao.objects.all())
+        # Dias que não têm mais nada (tickets apagados) também somem
+        ResumoDiarioTickets.objects.exclude(dia__in=dias).delete()
+        ResumoDiarioInteracoes.objects.exclude(dia__in=dias).delete()
+    else:
+        dias = _dias(
+            Ticket.objects.filter(data_atualizacao__gt=controle.ultima_execucao),
+            TicketInteracao.objects.filter(pk__gt=controle.ultimo_id_interacao),
+        )
+
+    total = recalcular_dias(dias)
+
+    controle.ultima_execucao = inicio
+    controle.ultimo_id_interacao = ultimo_id
+    controle.save(update_fields=["ultima_execucao", "ultimo_id_interacao"])
+    return total
+
+
+def volume_diario(ultimos_dias: int = 30) -> list:
+    """Totais por dia (todas as locations) para o painel, lidos só dos rollups."""
+    desde = timezone.localdate() - timedelta(days=ultimos_dias - 1)
+    tickets = {
+        linha["dia"]: linha
+        for linha in ResumoDiarioTickets.objects.filter(dia__gte=desde)
+        .values("dia")
+        .annotate(total=Sum("total"), criticos=Sum("criticos"))
+    }
+    interacoes = {
+        linha["dia"]: linha
+        for linha in ResumoDiarioInteracoes.objects.filter(dia__gte=desde)
+        .values("dia")
+        .annotate(total=Sum("total"), do_suporte=Sum("do_suporte"))
+    }
+    return [
+        {
+            "dia": dia,
+            "tickets": tickets.get(dia, {}).get("total", 0),
+            "criticos": tickets.get(dia, {}).get("criticos", 0),
+            "interacoes": interacoes.get(dia, {}).get("total", 0),
+            "do_suporte": interacoes.get(dia, {}).get("do_suporte", 0),
+        }
+        for dia in sorted(set(tickets) | set(interacoes), reverse=True)
+    ]
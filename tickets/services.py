@@ -1,12 +1,26 @@
+import csv
+import hashlib
 import logging
 import json
 import requests
 import urllib3
+from django.core.cache import cache
 from django.core.mail import EmailMessage
 from django.conf import settings
-from .models import Ticket, TicketInteracao, Cliente, Notificacao
+from .models import (
+    Ticket,
+    TicketInteracao,
+    Cliente,
+    Notificacao,
+    STATUS_ENCERRADOS,
+    MAXIMO_STATUS_CHOICES,
+    PRIORIDADE_CHOICES,
+)
+from . import busca, eventos
+from .uploads import tipo_conteudo
 from django.urls import reverse
-from django.db.models import Q
+from django.db.models import Count, Q
+from django.utils import timezone
 from django.utils.html import strip_tags
 
 logger = logging.getLogger(__name__)
@@ -77,13 +91,12 @@ class MaximoEmailService:
 
         if arquivo_upload:
             try:
-                # Lógica de anexo encapsulada
+                # Lógica de anexo encapsulada. O tipo vem do que o upload handler
+                # detectou ao receber (não do content_type enviado pelo navegador)
+                content_type = tipo_conteudo(arquivo_upload)
                 arquivo_upload.seek(0)
                 nome = arquivo_upload.name
                 conteudo = arquivo_upload.read()
-                content_type = getattr(
-                    arquivo_upload, "content_type", "application/octet-stream"
-                )
                 email.attach(nome, conteudo, content_type)
             except Exception as e:
                 logger.error(f"Erro ao anexar arquivo no service: {e}")
@@ -150,6 +163,72 @@ class NotificationService:
     para mudanças de status e novas mensagens no chat.
     """
 
+    # Rede de segurança: a invalidação é explícita, o TTL só limita o pior caso
+    CACHE_TIMEOUT = 600
+    LIMITE_DROPDOWN = 5
+
+    @staticmethod
+    def _chave_cache(usuario_id: int) -> str:
+        return f"notificacoes:resumo:{usuario_id}"
+
+    @classmethod
+    def resumo_nao_lidas(cls, usuario: Cliente) -> dict:
+        """
+        Contagem e prévia (5 mais antigas) das notificações não lidas do usuário.
+        Servido do cache; só consulta o banco depois de uma invalidação.
+        """
+        chave = cls._chave_cache(usuario.pk)
+        resumo = cache.get(chave)
+
+        if resumo is None:
+            qs_nao_lidas = Notificacao.objects.filter(destinatario=usuario, lida=False)
+            resumo = {
+                "total": qs_nao_lidas.count(),
+                # select_related evita uma query por item ao exibir o nº do ticket
+                "itens": list(
+                    qs_nao_lidas.select_related("ticket").order_by("data_criacao")[
+                        : cls.LIMITE_DROPDOWN
+                    ]
+                ),
+            }
+            cache.set(chave, resumo, cls.CACHE_TIMEOUT)
+
+        return resumo
+
+    @classmethod
+    def etag_resumo(cls, usuario: Cliente) -> str:
+        """
+        ETag do resumo do sininho: muda sempre que o total ou a prévia mudam.
+        Com itens na prévia, muda também a cada minuto: o HTML traz o "há N minutos"
+        (timesince) de cada notificação, que não pode ficar congelado num 304.
+        """
+        resumo = cls.resumo_nao_lidas(usuario)
+        assinatura = f"{usuario.pk}:{resumo['total']}:" + ",".join(
+            str(n.pk) for n in resumo["itens"]
+        )
+        if resumo["itens"]:
+            assinatura += f":{timezone.now():%Y%m%d%H%M}"
+        return hashlib.md5(assinatura.encode()).hexdigest()
+
+    @classmethod
+    def marcar_todas_lidas(cls, usuario: Cliente) -> int:
+        """
+        Marca todas as não lidas do usuário num único UPDATE. Retorna quantas mudaram.
+        """
+        atualizadas = Notificacao.objects.filter(destinatario=usuario, lida=False).update(
+            lida=True
+        )
+        # update() não dispara post_save: invalidamos o sininho manualmente
+        cls.invalidar_cache(usuario.pk)
+        return atualizadas
+
+    @classmethod
+    def invalidar_cache(cls, *usuarios_ids: int):
+        """
+        Descarta o resumo em cache (chamado ao criar ou marcar notificações como lidas).
+        """
+        cache.delete_many([cls._chave_cache(pk) for pk in set(usuarios_ids)])
+
     @staticmethod
     def _enviar_email_generico(destinatarios: list, assunto: str, corpo_html: str):
         """
@@ -294,6 +373,11 @@ class NotificationService:
 
         if notificacoes_db:
             Notificacao.objects.bulk_create(notificacoes_db)
+            # bulk_create não dispara post_save: invalidamos o sininho e avisamos as
+            # páginas abertas (SSE) manualmente, com um único evento para todos
+            destinatarios_ids = [n.destinatario_id for n in notificacoes_db]
+            cls.invalidar_cache(*destinatarios_ids)
+            eventos.publicar({"tipo": "notificacao", "destinatarios": destinatarios_ids})
 
         # === 2. ENVIO DO E-MAIL ===
         cls._enviar_email_generico(destinatarios_email, assunto_email, corpo_email)
@@ -373,3 +457,165 @@ class MaximoSenderService:
         except Exception as e:
             logger.error(f"Exceção ao conectar com Maximo: {e}")
             return False
+
+
+class FilaService:
+    """
+    Números do painel da fila de atendimento.
+    """
+
+    # Painel sem filtros: servido do cache, invalidado por signal ao salvar um Ticket
+    CACHE_CHAVE_ESTATISTICAS = "fila:estatisticas"
+    CACHE_TIMEOUT = 60
+
+    # Filtro de locations: muda só quando o admin edita um Cliente (signal);
+    # as contagens de abertos podem atrasar até o TTL
+    CACHE_CHAVE_LOCATIONS = "fila:locations"
+    CACHE_TIMEOUT_LOCATIONS = 300
+
+    # Exportação: (campo do values(), cabeçalho). Linhas lidas do banco em lotes.
+    COLUNAS_EXPORTACAO = (
+        ("maximo_id", "SR"),
+        ("sumario", "Resumo"),
+        ("status_maximo", "Status"),
+        ("prioridade", "Prioridade"),
+        ("cliente__username", "Cliente"),
+        ("cliente__email", "E-mail"),
+        ("cliente__location", "Location"),
+        ("ambiente__nome_ambiente", "Ambiente"),
+        ("area__nome_area", "Área"),
+        ("data_criacao", "Aberto em"),
+        ("data_atualizacao", "Atualizado em"),
+        ("total_interacoes", "Mensagens"),
+        ("ultima_interacao_em", "Última mensagem"),
+    )
+    TAMANHO_LOTE_EXPORTACAO = 2000
+    # Células de texto com esse início viram fórmula no Excel (CSV injection)
+    INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+    @staticmethod
+    def filtrar(tickets, params):
+        """
+        Filtros da fila (status, location, aguardando, q), usados pela tela e pela
+        exportação. Retorna (tickets, ordenacao).
+        """
+        status_filter = params.get("status")
+        location_filter = params.get("location")
+        search_query = params.get("q")
+        aguardando_filter = params.get("aguardando")
+
+        if status_filter:
+            tickets = tickets.filter(status_maximo=status_filter)
+
+        if location_filter:
+            # Filtra tickets onde o 'location' do cliente é igual ao selecionado
+            tickets = tickets.filter(cliente__location=location_filter)
+
+        if aguardando_filter:
+            # Cliente falou por último e o ticket segue aberto (índice parcial ticket_aguardando_idx)
+            tickets = tickets.filter(ultima_interacao_suporte=False).exclude(
+                status_maximo__in=STATUS_ENCERRADOS
+            )
+
+        if search_query:
+            # Full-text (índice GIN) em SR, resumo, descrição e cliente, por relevância
+            tickets = busca.buscar(tickets, search_query)
+            ordenacao = busca.ORDENACAO_RELEVANCIA
+        elif aguardando_filter:
+            ordenacao = ("ultima_interacao_em", "id")  # quem espera há mais tempo primeiro
+        else:
+            ordenacao = ("-data_criacao", "-id")
+
+        return tickets, ordenacao
+
+    @classmethod
+    def linhas_csv(cls, tickets):
+        """
+        Gera o CSV linha a linha (para StreamingHttpResponse): values() sem instanciar
+        modelos e iterator() em lotes, então a memória não cresce com o número de
+        tickets e o download começa antes da consulta terminar.
+        Separador ";" e BOM para o Excel em português abrir direto.
+        """
+
+        class _Eco:
+            # csv.writer escreve aqui; devolvemos a linha em vez de guardá-la
+            def write(self, valor):
+                return valor
+
+        writer = csv.writer(_Eco(), delimiter=";")
+        status = dict(MAXIMO_STATUS_CHOICES)
+        prioridades = dict(PRIORIDADE_CHOICES)
+        campos = [campo for campo, _ in cls.COLUNAS_EXPORTACAO]
+
+        def _formatar(campo, valor):
+            if valor is None:
+                return ""
+            if campo == "status_maximo":
+                return status.get(valor, valor)
+            if campo == "prioridade":
+                return prioridades.get(valor, valor) if valor else ""
+            if hasattr(valor, "tzinfo"):
+                return timezone.localtime(valor).strftime("%d/%m/%Y %H:%M")
+            if isinstance(valor, str) and valor.startswith(cls.INICIO_FORMULA):
+                # Texto do cliente (resumo, nome) que o Excel executaria como fórmula
+                return "'" + valor
+            return valor
+
+        yield "\ufeff" + writer.writerow([titulo for _, titulo in cls.COLUNAS_EXPORTACAO])
+        for linha in tickets.values(*campos).iterator(
+            chunk_size=cls.TAMANHO_LOTE_EXPORTACAO
+        ):
+            yield writer.writerow([_formatar(campo, linha[campo]) for campo in campos])
+
+    @staticmethod
+    def calcular_estatisticas(tickets) -> dict:
+        """
+        Total, críticos e novos numa única passada (COUNT ... FILTER), em vez de
+        um count() por número.
+        """
+        return tickets.order_by().aggregate(
+            total=Count("pk"),
+            criticos=Count("pk", filter=Q(prioridade="1")),
+            novos=Count("pk", filter=Q(status_maximo="NEW")),
+        )
+
+    @classmethod
+    def estatisticas_gerais(cls) -> dict:
+        """Estatísticas da fila inteira (sem filtros), com TTL curto."""
+        return cache.get_or_set(
+            cls.CACHE_CHAVE_ESTATISTICAS,
+            lambda: cls.calcular_estatisticas(Ticket.objects.all()),
+            cls.CACHE_TIMEOUT,
+        )
+
+    @classmethod
+    def invalidar_cache(cls):
+        cache.delete(cls.CACHE_CHAVE_ESTATISTICAS)
+
+    @classmethod
+    def locations(cls) -> list:
+        """
+        [(location, tickets_abertos), ...] em ordem alfabética, para o filtro da fila.
+        """
+
+        def _calcular():
+            return [
+                (linha["location"], linha["abertos"])
+                for linha in Cliente.objects.exclude(location__isnull=True)
+                .exclude(location__exact="")
+                .values("location")
+                .annotate(
+                    abertos=Count(
+                        "tickets", filter=~Q(tickets__status_maximo__in=STATUS_ENCERRADOS)
+                    )
+                )
+                .order_by("location")
+            ]
+
+        return cache.get_or_set(
+            cls.CACHE_CHAVE_LOCATIONS, _calcular, cls.CACHE_TIMEOUT_LOCATIONS
+        )
+
+    @classmethod
+    def invalidar_locations(cls):
+        cache.delete(cls.CACHE_CHAVE_LOCATIONS)
@@ -1,7 +1,10 @@
-from django.db.models.signals import pre_save, post_save
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Ticket
-from .services import NotificationService
+from .models import Ticket, TicketInteracao, TicketStatusHistorico, Notificacao, Cliente
+from .services import NotificationService, FilaService
+from . import atividade, busca, eventos, miniaturas
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,6 +16,11 @@ def monitorar_mudancas_ticket(sender, instance: Ticket, **kwargs):
     Monitora alterações no Ticket (ex: Mudança de Status).
     Otimização: Realiza apenas UMA consulta ao banco para comparar o estado anterior.
     """
+    # Status anterior para o histórico, gravado no post_save (depois do UPDATE)
+    instance._status_para_historico = None
+    # Ticket novo sempre indexa; nos demais, só se algum campo da busca mudou
+    instance._reindexar_busca = True
+
     # Se é criação (sem ID), ignoramos pois a view/service de criação já trata
     if not instance.pk:
         return
@@ -22,6 +30,11 @@ def monitorar_mudancas_ticket(sender, instance: Ticket, **kwargs):
     except Ticket.DoesNotExist:
         return
 
+    instance._reindexar_busca = any(
+        getattr(old_instance, campo) != getattr(instance, campo)
+        for campo in busca.ATRIBUTOS_INDEXADOS
+    )
+
     # Verifica mudança de status
     if old_instance.status_maximo != instance.status_maximo:
         logger.info(
@@ -36,6 +49,199 @@ def monitorar_mudancas_ticket(sender, instance: Ticket, **kwargs):
         except Exception as e:
             logger.error(f"Erro notificação status (Ticket {instance.id}): {e}")
 
+        # Histórico de status: o sincronizar_maximo grava em lote; aqui ficam as
+        # mudanças feitas por outros caminhos (ex: admin)
+        if not getattr(instance, "_historico_em_lote", False):
+            instance._status_para_historico = old_instance.status_maximo
+
+
+@receiver(post_save, sender=Ticket)
+def registrar_historico_status(sender, instance: Ticket, created, **kwargs):
+    """
+    Grava a mudança detectada no pre_save só depois do UPDATE do ticket: se o save
+    falhar (ou a transação for desfeita), o histórico não registra o que não houve.
+    """
+    status_anterior = getattr(instance, "_status_para_historico", None)
+    if created or status_anterior is None:
+        return
+    instance._status_para_historico = None
+    desde = (
+        instance.historico_status.order_by("-data").values_list("data", flat=True).first()
+    )
+    TicketStatusHistorico.registrar(instance, status_anterior, desde=desde).save()
+
+
+@receiver(post_save, sender=Ticket)
+def atualizar_busca_ticket(sender, instance: Ticket, update_fields=None, **kwargs):
+    """
+    Mantém o vetor de busca da fila. Saves que não mudam os campos indexados
+    (parciais, como só o status, ou completos comparados no pre_save) não pagam o
+    UPDATE extra.
+    """
+    if update_fields is not None and not busca.CAMPOS_INDEXADOS & set(update_fields):
+        return
+    if not getattr(instance, "_reindexar_busca", True):
+        return
+    busca.atualizar_ticket(instance)
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidar_estatisticas_fila(sender, instance: Ticket, **kwargs):
+    """Ticket criado, apagado ou com status/prioridade alterados: painel da fila muda."""
+    FilaService.invalidar_cache()
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def invalidar_locations_fila(sender, instance: Cliente, update_fields=None, **kwargs):
+    """Filtro de locations da fila em cache. Ignora o save do login (last_login)."""
+    if update_fields is not None and "location" not in update_fields:
+        return
+    FilaService.invalidar_locations()
+
+
+@receiver(post_save, sender=Cliente)
+def atualizar_busca_cliente(sender, instance: Cliente, created, update_fields=None, **kwargs):
+    """
+    Nome/location do cliente fazem parte da busca dos tickets dele.
+    Ignora o save do login (update_fields=['last_login']).
+    """
+    if created:
+        return
+    if update_fields is not None and not {
+        "username",
+        "first_name",
+        "last_name",
+        "location",
+    } & set(update_fields):
+        return
+    busca.atualizar_cliente(instance)
+
+
+@receiver(post_save, sender=Notificacao)
+@receiver(post_delete, sender=Notificacao)
+def invalidar_cache_notificacoes(sender, instance: Notificacao, **kwargs):
+    """
+    Criou, leu ou apagou uma notificação: o resumo do sininho em cache fica velho.
+    """
+    NotificationService.invalidar_cache(instance.destinatario_id)
+
+
+@receiver(post_save, sender=Notificacao)
+def publicar_nova_notificacao(sender, instance: Notificacao, created, **kwargs):
+    """
+    Avisa as páginas abertas do destinatário (SSE) para atualizarem o sininho.
+    """
+    if created:
+        eventos.publicar(
+            {"tipo": "notificacao", "destinatarios": [instance.destinatario_id]}
+        )
+
+
+@receiver(post_save, sender=TicketInteracao)
+def atualizar_atividade_ticket(sender, instance: TicketInteracao, created, **kwargs):
+    """Contadores de atividade do Ticket (total, última mensagem)."""
+    if created:
+        atividade.registrar_interacao(instance)
+
+
+@receiver(post_delete, sender=TicketInteracao)
+def recalcular_atividade_ticket(sender, instance: TicketInteracao, **kwargs):
+    atividade.recalcular([instance.ticket_id])
+
+
+@receiver(post_save, sender=TicketInteracao)
+def publicar_nova_interacao(sender, instance: TicketInteracao, created, **kwargs):
+    """
+    Empurra a nova mensagem (inclusive logs importados do Maximo) para quem está
+    com o ticket aberto.
+    """
+    if created:
+        eventos.publicar(
+            {"tipo": "interacao", "id": instance.pk, "ticket_id": instance.ticket_id}
+        )
+
+
+@receiver(post_save, sender=TicketInteracao)
+@receiver(post_delete, sender=TicketInteracao)
+def invalidar_cache_interacao(sender, instance: TicketInteracao, created=False, **kwargs):
+    """
+    Mensagens não mudam depois de enviadas; as exceções são a edição pelo admin
+    (TicketInteracaoInline) e a miniatura do anexo, que fica pronta depois.
+    Nesses casos descarta o HTML em cache da mensagem.
+    """
+    if not created:
+        caches["fragmentos"].delete(
+            make_template_fragment_key("chat_message_v2", [instance.pk])
+        )
+
+
+# Dados do autor que aparecem no HTML em cache de cada mensagem (nome e papel)
+CAMPOS_AUTOR_CHAT = ("username", "first_name", "last_name", "is_staff")
+
+
+def _invalidar_mensagens_dos_autores(autores_ids):
+    """Descarta o HTML em cache de todas as mensagens desses autores (evento raro)."""
+    ids = TicketInteracao.objects.filter(autor_id__in=autores_ids).values_list(
+        "pk", flat=True
+    )
+    chaves = []
+    for pk in ids.iterator(chunk_size=2000):
+        chaves.append(make_template_fragment_key("chat_message_v2", [pk]))
+        if len(chaves) == 2000:
+            caches["fragmentos"].delete_many(chaves)
+            chaves = []
+    if chaves:
+        caches["fragmentos"].delete_many(chaves)
+
+
+@receiver(pre_save, sender=Cliente)
+def detectar_mudanca_autor_chat(sender, instance: Cliente, update_fields=None, **kwargs):
+    """
+    Nome ou is_staff mudou? Só consulta o banco em saves que podem mexer nesses
+    campos (o do login, update_fields=['last_login'], passa direto).
+    """
+    instance._autor_chat_mudou = False
+    if not instance.pk:
+        return
+    if update_fields is not None and not set(CAMPOS_AUTOR_CHAT) & set(update_fields):
+        return
+    anterior = Cliente.objects.filter(pk=instance.pk).values(*CAMPOS_AUTOR_CHAT).first()
+    instance._autor_chat_mudou = anterior is not None and any(
+        anterior[campo] != getattr(instance, campo) for campo in CAMPOS_AUTOR_CHAT
+    )
+
+
+@receiver(post_save, sender=Cliente)
+def invalidar_mensagens_autor(sender, instance: Cliente, created, **kwargs):
+    if not created and getattr(instance, "_autor_chat_mudou", False):
+        _invalidar_mensagens_dos_autores([instance.pk])
+
+
+@receiver(m2m_changed, sender=Cliente.groups.through)
+def invalidar_mensagens_grupo_autor(sender, instance, action, reverse, pk_set, **kwargs):
+    """Entrou ou saiu do grupo Consultores: muda o papel (suporte/cliente) no chat."""
+    if action in ("post_add", "post_remove"):
+        autores = pk_set if reverse else [instance.pk]
+    elif action == "pre_clear" and reverse:
+        # Grupo esvaziado: depois do clear não dá mais para saber quem estava nele
+        autores = list(instance.cliente_groups.values_list("pk", flat=True))
+    elif action == "post_clear" and not reverse:
+        autores = [instance.pk]
+    else:
+        return
+    if autores:
+        _invalidar_mensagens_dos_autores(autores)
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_save, sender=TicketInteracao)
+def agendar_miniatura(sender, instance, created, **kwargs):
+    """Anexo de imagem novo: gera a prévia em segundo plano (miniaturas.py)."""
+    if created:
+        miniaturas.agendar(instance)
+
 
 def post_save_interacao(sender, instance, created, **kwargs):
     """
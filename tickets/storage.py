@@ -0,0 +1,227 @@
+"""
+Armazenamento dos anexos com deduplicação por conteúdo.
+
+Cada conteúdo é gravado uma única vez em `cas/ab/cd/<sha256>` (dentro do MEDIA_ROOT).
+O caminho que o FileField guarda (ex: tickets/12/chat/log.txt) é um hardlink para
+esse blob: o nome continua o original, mas o mesmo log enviado em 10 tickets ocupa
+o disco uma vez só. Se o blob já existe, o upload não grava nenhum byte, só cria
+o link. O SHA-256 vem do upload handler (tickets/uploads.py) quando disponível.
+
+Compressão: anexos de texto (.txt, .csv, .xml) vão para o blob comprimidos com
+zstd (logs e planilhas encolhem 5-10x). O hash é sempre o do conteúdo original,
+então a deduplicação não muda. Ao abrir, o storage reconhece o quadro zstd pelos
+primeiros bytes e devolve um arquivo que descomprime enquanto é lido, com `size`
+do tamanho original: quem baixa recebe exatamente o que enviou.
+
+Contagem de referências: é o próprio contador de links do sistema de arquivos
+(st_nlink). Apagar um anexo remove só o link; o blob sem links (st_nlink == 1) e os
+links que nenhum registro usa mais são removidos pelo comando `limpar_anexos`.
+"""
+
+import hashlib
+import os
+import uuid
+
+import zstandard
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+PASTA_BLOBS = "cas"
+
+# Gravados comprimidos (o tipo real já foi conferido contra a extensão no upload)
+EXTENSOES_COMPRIMIDAS = {".txt", ".csv", ".xml"}
+NIVEL_ZSTD = 3  # rápido o bastante para não atrasar uploads de 150 MB
+MAGICO_ZSTD = b"\x28\xb5\x2f\xfd"
+
+
+def _comprimido(cabecalho: bytes) -> bool:
+    """Quadro zstd válido (magic number + cabeçalho que faz sentido)."""
+    if not cabecalho.startswith(MAGICO_ZSTD):
+        return False
+    try:
+        zstandard.get_frame_parameters(cabecalho)
+    except zstandard.ZstdError:
+        return False
+    return True
+
+
+class ArquivoDescomprimido(File):
+    """Blob zstd lido como o arquivo original: descomprime em pedaços, sob demanda."""
+
+    def __init__(self, bruto, name, tamanho):
+        self.bruto = bruto
+        leitor = zstandard.ZstdDecompressor().stream_reader(bruto, closefd=True)
+        super().__init__(leitor, name)
+        if tamanho >= 0:
+            self.size = tamanho
+
+    def chunks(self, chunk_size=None):
+        # stream_reader não volta (seek) ao início como o File.chunks pede
+        while pedaco := self.file.read(chunk_size or self.DEFAULT_CHUNK_SIZE):
+            yield pedaco
+
+    def close(self):
+        self.file.close()
+        self.bruto.close()
+
+
+class ArmazenamentoDeduplicado(FileSystemStorage):
+    """FileSystemStorage que guarda cada conteúdo uma vez e cria hardlinks por nome."""
+
+    @staticmethod
+    def caminho_blob(sha256: str) -> str:
+        return f"{PASTA_BLOBS}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def _criar_pastas(self, caminho):
+        """Pastas de `caminho` com o FILE_UPLOAD_DIRECTORY_PERMISSIONS, como o FileSystemStorage."""
+        pasta = os.path.dirname(caminho)
+        if self.directory_permissions_mode is None:
+            os.makedirs(pasta, exist_ok=True)
+            return
+        umask = os.umask(0o777 & ~self.directory_permissions_mode)
+        try:
+            os.makedirs(pasta, self.directory_permissions_mode, exist_ok=True)
+        finally:
+            os.umask(umask)
+
+    def _temporario(self) -> str:
+        caminho = self.path(f"{PASTA_BLOBS}/tmp/{uuid.uuid4().hex}")
+        self._criar_pastas(caminho)
+        return caminho
+
+    @staticmethod
+    def comprimir(name) -> bool:
+        return os.path.splitext(name)[1].lower() in EXTENSOES_COMPRIMIDAS
+
+    def _gravar_temporario(self, content, comprimir: bool) -> tuple:
+        """Leva o conteúdo para cas/tmp/ (movendo o temporário do upload, se houver)."""
+        destino = self._temporario()
+        sha = getattr(content, "sha256", None)
+
+        if hasattr(content, "temporary_file_path") and sha and not comprimir:
+            file_move_safe(content.temporary_file_path(), destino)
+            return destino, sha
+
+        calculado = hashlib.sha256()
+        with open(destino, "wb") as saida:
+            if comprimir:
+                # Com o tamanho no cabeçalho do quadro, o size() não precisa descomprimir
+                compressor = zstandard.ZstdCompressor(level=NIVEL_ZSTD)
+                saida = compressor.stream_writer(saida, size=content.size)
+            if hasattr(content, "seek"):
+                content.seek(0)
+            for pedaco in content.chunks():
+                calculado.update(pedaco)
+                saida.write(pedaco)
+            saida.close()
+        return destino, calculado.hexdigest()
+
+    def _blob(self, content, name, reaproveitar=True) -> str:
+        """Nome do blob com esse conteúdo, gravando-o só se ainda não existir."""
+        sha = getattr(content, "sha256", None)
+        if reaproveitar and sha and self.exists(self.caminho_blob(sha)):
+            return self.caminho_blob(sha)  # duplicado: zero bytes gravados
+
+        temporario, sha = self._gravar_temporario(content, self.comprimir(name))
+        # O temporário do upload vem com 0600: o nginx/Apache (X-Accel/X-Sendfile)
+        # roda com outro usuário e precisa ler. Os links herdam o modo do blob.
+        os.chmod(temporario, self.file_permissions_mode or 0o644)
+        blob = self.caminho_blob(sha)
+        caminho = self.path(blob)
+        self._criar_pastas(caminho)
+        try:
+            # link() nunca sobrescreve: dois uploads iguais ao mesmo tempo ficam
+            # com o mesmo blob (o segundo só descarta o temporário)
+            os.link(temporario, caminho)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temporario)
+        return blob
+
+    def _save(self, name, content):
+        origem = self.path(self._blob(content, name))
+        regravado = False
+        while True:
+            caminho = self.path(name)
+            self._criar_pastas(caminho)
+            try:
+                os.link(origem, caminho)
+            except FileExistsError:
+                # Nome ocupado entre o get_available_name e o link: nunca sobrescreve
+                name = self.get_available_name(name)
+                continue
+            except FileNotFoundError:
+                # O limpar_anexos removeu o blob (antigo, sem links) entre o exists()
+                # do _blob e o link: grava o conteúdo de novo. O blob regravado é
+                # novo, então a limpeza não o pega antes do link.
+                if regravado:
+                    raise
+                regravado = True
+                origem = self.path(self._blob(content, name, reaproveitar=False))
+                continue
+            return name.replace("\\", "/")
+
+    def _open(self, name, mode="rb"):
+        arquivo = super()._open(name, mode)
+        if "b" not in mode or any(c in mode for c in "wa+"):
+            return arquivo
+        cabecalho = arquivo.read(18)  # maior cabeçalho de quadro zstd possível
+        arquivo.seek(0)
+        if not _comprimido(cabecalho):
+            return arquivo
+        tamanho = zstandard.frame_content_size(cabecalho)
+        return ArquivoDescomprimido(arquivo.file, name, tamanho)
+
+    def size(self, name):
+        """Tamanho original (o que o usuário enviou e vai baixar), não o do blob."""
+        with open(self.path(name), "rb") as arquivo:
+            cabecalho = arquivo.read(18)
+        if _comprimido(cabecalho):
+            tamanho = zstandard.frame_content_size(cabecalho)
+            if tamanho >= 0:
+                return tamanho
+        return super().size(name)
+
+    def esta_comprimido(self, name) -> bool:
+        with open(self.path(name), "rb") as arquivo:
+            return _comprimido(arquivo.read(18))
+
+    def tamanho_em_disco(self, name) -> int:
+        return super().size(name)
+
+    def deduplicar(self, name):
+        """Troca um arquivo comum (gravado antes deste storage) por um link para o blob."""
+        caminho = self.path(name)
+        sha = hashlib.sha256()
+        with open(caminho, "rb") as arquivo:
+            for pedaco in iter(lambda: arquivo.read(1024 * 1024), b""):
+                sha.update(pedaco)
+        blob = self.path(self.caminho_blob(sha.hexdigest()))
+        self._criar_pastas(blob)
+        try:
+            os.link(caminho, blob)  # primeiro com esse conteúdo: ele mesmo vira o blob
+        except FileExistsError:
+            # Já havia uma cópia: link num nome temporário e replace atômico
+            # (o anexo nunca fica indisponível)
+            temporario = self._temporario()
+            os.link(blob, temporario)
+            os.replace(temporario, caminho)
+
+    def arquivos(self, pasta):
+        """(nome, stat) de todos os arquivos sob `pasta`, recursivo."""
+        raiz = self.path(pasta)
+        for diretorio, _, nomes in os.walk(raiz):
+            for nome in nomes:
+                caminho = os.path.join(diretorio, nome)
+                relativo = os.path.relpath(caminho, self.location).replace(os.sep, "/")
+                yield relativo, os.stat(caminho)
+
+    def referencias(self, name) -> int:
+        """Quantos nomes (anexos) apontam para o mesmo conteúdo deste arquivo."""
+        return os.stat(self.path(name)).st_nlink - 1
+
+
+def armazenamento_anexos():
+    return ArmazenamentoDeduplicado()
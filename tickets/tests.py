@@ -1,3 +1,327 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db.models.fields.files import FieldFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .downloads import servir_anexo
+from .models import Cliente, Ticket, TicketInteracao
+from .storage import armazenamento_anexos
+
+
+class ServirAnexoTests(SimpleTestCase):
+    """Download pelo Django (modo "python"): Range, If-Range, 304 e blobs comprimidos."""
+
+    PDF = b"%PDF-1.4 " + bytes(range(256)) * 40
+    TEXTO = "".join(f"linha {i}\n" for i in range(2000)).encode()
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        configuracao = override_settings(MEDIA_ROOT=media, ANEXO_DOWNLOAD_MODO="python")
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        storage = armazenamento_anexos()
+        self.pdf = storage.save("tickets/1/chat/evidencia.pdf", ContentFile(self.PDF))
+        self.txt = storage.save("tickets/1/chat/log.txt", ContentFile(self.TEXTO))
+
+    def _baixar(self, nome, **cabecalhos):
+        # FieldFile novo por request, como na view (o arquivo é aberto e fechado a cada download)
+        anexo = FieldFile(None, TicketInteracao._meta.get_field("anexo"), nome)
+        request = RequestFactory().get("/", **cabecalhos)
+        return servir_anexo(request, anexo, nome.rsplit("/", 1)[-1])
+
+    @staticmethod
+    def _corpo(response):
+        return b"".join(response.streaming_content) if response.streaming else response.content
+
+    def test_arquivo_inteiro(self):
+        response = self._baixar(self.pdf)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._corpo(response), self.PDF)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("ETag", response)
+
+    def test_range_inicio_fim(self):
+        response = self._baixar(self.pdf, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.PDF)}")
+        self.assertEqual(response["Content-Length"], "100")
+        self.assertEqual(self._corpo(response), self.PDF[100:200])
+
+    def test_range_sufixo(self):
+        response = self._baixar(self.pdf, HTTP_RANGE="bytes=-50")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._corpo(response), self.PDF[-50:])
+
+    def test_range_fim_alem_do_arquivo_e_limitado(self):
+        response = self._baixar(self.pdf, HTTP_RANGE="bytes=10000-99999999")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._corpo(response), self.PDF[10000:])
+
+    def test_range_inicio_alem_do_fim_e_416(self):
+        tamanho = len(self.PDF)
+        for inicio in (tamanho, tamanho + 100):
+            response = self._baixar(self.pdf, HTTP_RANGE=f"bytes={inicio}-")
+            self.assertEqual(response.status_code, 416)
+            self.assertEqual(response["Content-Range"], f"bytes */{tamanho}")
+
+    def test_if_range_de_outra_versao_devolve_arquivo_inteiro(self):
+        response = self._baixar(
+            self.pdf, HTTP_RANGE="bytes=10-19", HTTP_IF_RANGE='"versao-antiga"'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._corpo(response), self.PDF)
+
+    def test_if_range_da_mesma_versao_respeita_range(self):
+        etag = self._baixar(self.pdf)["ETag"]
+        response = self._baixar(self.pdf, HTTP_RANGE="bytes=10-19", HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._corpo(response), self.PDF[10:20])
+
+    def test_if_none_match_304(self):
+        etag = self._baixar(self.pdf)["ETag"]
+        response = self._baixar(self.pdf, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+    def test_blob_comprimido_devolve_o_original(self):
+        storage = armazenamento_anexos()
+        self.assertTrue(storage.esta_comprimido(self.txt))
+        self.assertLess(storage.tamanho_em_disco(self.txt), len(self.TEXTO))
+
+        response = self._baixar(self.txt)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Length"], str(len(self.TEXTO)))
+        self.assertEqual(self._corpo(response), self.TEXTO)
+
+    def test_range_em_blob_comprimido(self):
+        response = self._baixar(self.txt, HTTP_RANGE="bytes=1000-1099")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._corpo(response), self.TEXTO[1000:1100])
+
+
+class MidiaTemporariaMixin:
+    """MEDIA_ROOT numa pasta temporária, apagada no fim de cada teste."""
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        configuracao = override_settings(MEDIA_ROOT=self.media)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.storage = armazenamento_anexos()
+
+    def _conteudo(self, dados, com_sha=False):
+        conteudo = ContentFile(dados)
+        if com_sha:
+            # Como o upload handler (tickets/uploads.py) entrega o arquivo
+            conteudo.sha256 = hashlib.sha256(dados).hexdigest()
+        return conteudo
+
+    def _inode(self, nome):
+        return os.stat(self.storage.path(nome)).st_ino
+
+
+class ArmazenamentoDeduplicadoTests(MidiaTemporariaMixin, SimpleTestCase):
+    """Blobs por conteúdo, hardlinks por nome e conversão de anexos antigos."""
+
+    DADOS = b"%PDF-1.4 " + bytes(range(256)) * 20
+
+    def test_mesmo_conteudo_vira_um_blob_so(self):
+        a = self.storage.save("tickets/1/chat/a.pdf", self._conteudo(self.DADOS))
+        b = self.storage.save("tickets/2/chat/b.pdf", self._conteudo(self.DADOS))
+        blob = self.storage.caminho_blob(hashlib.sha256(self.DADOS).hexdigest())
+
+        self.assertEqual(self._inode(a), self._inode(blob))
+        self.assertEqual(self._inode(b), self._inode(blob))
+        self.assertEqual(self.storage.referencias(a), 2)
+        with self.storage.open(b) as arquivo:
+            self.assertEqual(arquivo.read(), self.DADOS)
+
+    def test_sha_do_upload_reaproveita_blob_sem_gravar(self):
+        primeiro = self.storage.save("tickets/1/chat/a.pdf", self._conteudo(self.DADOS))
+        with mock.patch.object(
+            type(self.storage), "_gravar_temporario", side_effect=AssertionError
+        ):
+            segundo = self.storage.save(
+                "tickets/2/chat/a.pdf", self._conteudo(self.DADOS, com_sha=True)
+            )
+        self.assertEqual(self._inode(primeiro), self._inode(segundo))
+        self.assertEqual(self.storage.referencias(primeiro), 2)
+
+    def test_nome_ocupado_no_momento_do_link_ganha_outro_nome(self):
+        ocupado = "tickets/1/chat/log.pdf"
+        self.storage.save(ocupado, self._conteudo(b"outro conteudo"))
+        # Simula outro upload que pegou o nome depois do get_available_name
+        nomes = [ocupado, "tickets/1/chat/log_2.pdf"]
+        with mock.patch.object(type(self.storage), "get_available_name", side_effect=nomes):
+            nome = self.storage.save(ocupado, self._conteudo(self.DADOS))
+
+        self.assertEqual(nome, "tickets/1/chat/log_2.pdf")
+        with self.storage.open(ocupado) as arquivo:
+            self.assertEqual(arquivo.read(), b"outro conteudo")
+        with self.storage.open(nome) as arquivo:
+            self.assertEqual(arquivo.read(), self.DADOS)
+
+    def test_blob_removido_pela_limpeza_antes_do_link_e_regravado(self):
+        nome = self.storage.save("tickets/1/chat/a.pdf", self._conteudo(self.DADOS))
+        blob = self.storage.caminho_blob(hashlib.sha256(self.DADOS).hexdigest())
+        self.storage.delete(nome)
+        self.storage.delete(blob)  # limpar_anexos, entre o exists() e o link
+
+        existe = self.storage.exists
+        with mock.patch.object(
+            self.storage, "exists", side_effect=lambda n: n == blob or existe(n)
+        ):
+            novo = self.storage.save(
+                "tickets/2/chat/a.pdf", self._conteudo(self.DADOS, com_sha=True)
+            )
+
+        self.assertEqual(self._inode(novo), self._inode(blob))
+        with self.storage.open(novo) as arquivo:
+            self.assertEqual(arquivo.read(), self.DADOS)
+
+    def test_deduplicar_anexos_antigos(self):
+        comum = FileSystemStorage()
+        a = comum.save("tickets/1/chat/a.pdf", ContentFile(self.DADOS))
+        b = comum.save("tickets/2/chat/b.pdf", ContentFile(self.DADOS))
+        self.assertNotEqual(self._inode(a), self._inode(b))
+
+        self.storage.deduplicar(a)  # primeiro com esse conteúdo: vira o blob
+        self.storage.deduplicar(b)  # cópia: troca pelo link
+
+        blob = self.storage.caminho_blob(hashlib.sha256(self.DADOS).hexdigest())
+        self.assertEqual(self._inode(a), self._inode(blob))
+        self.assertEqual(self._inode(b), self._inode(blob))
+        self.assertEqual(self.storage.referencias(a), 2)
+        with self.storage.open(b) as arquivo:
+            self.assertEqual(arquivo.read(), self.DADOS)
+
+
+class ArmazenamentoComprimidoTests(MidiaTemporariaMixin, SimpleTestCase):
+    """Anexos de texto comprimidos com zstd: quem lê recebe sempre o original."""
+
+    TEXTO = "".join(f"12:00:{i % 60:02d} INFO linha {i}\n" for i in range(3000)).encode()
+
+    def test_texto_vai_comprimido_e_volta_original(self):
+        nome = self.storage.save("tickets/1/chat/log.txt", self._conteudo(self.TEXTO))
+
+        self.assertTrue(self.storage.esta_comprimido(nome))
+        self.assertLess(self.storage.tamanho_em_disco(nome), len(self.TEXTO) // 5)
+        with self.storage.open(nome) as arquivo:
+            self.assertEqual(arquivo.size, len(self.TEXTO))
+            self.assertEqual(b"".join(arquivo.chunks(chunk_size=1000)), self.TEXTO)
+
+    def test_outras_extensoes_ficam_como_enviadas(self):
+        nome = self.storage.save("tickets/1/chat/log.pdf", self._conteudo(self.TEXTO))
+
+        self.assertFalse(self.storage.esta_comprimido(nome))
+        self.assertEqual(self.storage.tamanho_em_disco(nome), len(self.TEXTO))
+        with self.storage.open(nome) as arquivo:
+            self.assertEqual(arquivo.read(), self.TEXTO)
+
+    def test_open_reconhece_o_quadro_pelo_cabecalho(self):
+        # Blob comprimido com nome de outra extensão (ex: mesmo conteúdo, ver abaixo)
+        nome = self.storage.save("tickets/1/chat/log.txt", self._conteudo(self.TEXTO))
+        renomeado = "tickets/1/chat/log.bin"
+        os.link(self.storage.path(nome), self.storage.path(renomeado))
+        with self.storage.open(renomeado) as arquivo:
+            self.assertEqual(arquivo.read(), self.TEXTO)
+
+        # Texto que começa com o magic number, mas sem quadro válido: lido cru
+        falso = b"\x28\xb5\x2f\xfd" + b"\xff" * 20
+        with open(self.storage.path("tickets/1/chat/falso.bin"), "wb") as arquivo:
+            arquivo.write(falso)
+        with self.storage.open("tickets/1/chat/falso.bin") as arquivo:
+            self.assertEqual(arquivo.read(), falso)
+
+    def test_size_vem_do_cabecalho_sem_descomprimir(self):
+        nome = self.storage.save("tickets/1/chat/log.txt", self._conteudo(self.TEXTO))
+        with mock.patch("zstandard.ZstdDecompressor", side_effect=AssertionError):
+            self.assertEqual(self.storage.size(nome), len(self.TEXTO))
+
+    def test_texto_vazio(self):
+        nome = self.storage.save("tickets/1/chat/vazio.txt", self._conteudo(b""))
+
+        self.assertEqual(self.storage.size(nome), 0)
+        with self.storage.open(nome) as arquivo:
+            self.assertEqual(arquivo.read(), b"")
+
+    def test_mesmo_conteudo_comprimido_e_nao_comprimido(self):
+        # O hash é do original: .txt e .pdf iguais dividem o blob, na forma de quem
+        # chegou primeiro, e os dois nomes devolvem o mesmo conteúdo
+        for primeiro, segundo in (("a.txt", "a.pdf"), ("b.pdf", "b.txt")):
+            with self.subTest(primeiro=primeiro):
+                dados = self.TEXTO + primeiro.encode()  # um blob por par
+                a = self.storage.save(f"tickets/1/chat/{primeiro}", self._conteudo(dados))
+                b = self.storage.save(f"tickets/2/chat/{segundo}", self._conteudo(dados))
+
+                self.assertEqual(self._inode(a), self._inode(b))
+                self.assertEqual(
+                    self.storage.esta_comprimido(b), self.storage.comprimir(primeiro)
+                )
+                for nome in (a, b):
+                    self.assertEqual(self.storage.size(nome), len(dados))
+                    with self.storage.open(nome) as arquivo:
+                        self.assertEqual(arquivo.read(), dados)
+
+
+class LimparAnexosTests(MidiaTemporariaMixin, TestCase):
+    """Regras de remoção do comando limpar_anexos (links sem uso, blobs e temporários)."""
+
+    def setUp(self):
+        super().setUp()
+        salvar = self.storage.save
+        self.usado = salvar("tickets/1/anexos/usado.pdf", self._conteudo(b"usado"))
+        self.orfao = salvar("tickets/2/anexos/orfao.pdf", self._conteudo(b"orfao"))
+        self.copia = salvar("tickets/3/anexos/copia.pdf", self._conteudo(b"usado"))
+        self.blob_usado = self.storage.caminho_blob(hashlib.sha256(b"usado").hexdigest())
+        self.blob_orfao = self.storage.caminho_blob(hashlib.sha256(b"orfao").hexdigest())
+        self.temporario = os.path.relpath(self.storage._temporario(), self.media)
+        with open(self.storage.path(self.temporario), "wb") as arquivo:
+            arquivo.write(b"upload interrompido")
+
+        cliente = Cliente.objects.create(username="cliente", email="cliente@exemplo.com")
+        # bulk_create: sem sinais (busca, miniaturas), só o nome do anexo no banco
+        Ticket.objects.bulk_create(
+            [Ticket(cliente=cliente, sumario="s", descricao="d", anexo=self.usado)]
+        )
+
+    def _limpar(self, *args, daqui_a=timedelta(0)):
+        agora = timezone.now() + daqui_a
+        with mock.patch("django.utils.timezone.now", return_value=agora):
+            call_command("limpar_anexos", *args, stdout=StringIO())
+
+    def test_remove_links_sem_uso_blobs_sem_links_e_temporarios(self):
+        self._limpar(daqui_a=timedelta(hours=25))
+
+        self.assertTrue(self.storage.exists(self.usado))
+        self.assertTrue(self.storage.exists(self.blob_usado))
+        self.assertFalse(self.storage.exists(self.orfao))
+        self.assertFalse(self.storage.exists(self.copia))
+        self.assertFalse(self.storage.exists(self.blob_orfao))
+        self.assertFalse(self.storage.exists(self.temporario))
+        self.assertEqual(self.storage.referencias(self.usado), 1)
+
+    def test_arquivos_recentes_ficam(self):
+        self._limpar()
+        for nome in (self.orfao, self.copia, self.blob_orfao, self.temporario):
+            self.assertTrue(self.storage.exists(nome), nome)
+
+    def test_dry_run_nao_remove_nada(self):
+        self._limpar("--dry-run", daqui_a=timedelta(hours=25))
+        for nome in (self.orfao, self.copia, self.blob_orfao, self.temporario):
+            self.assertTrue(self.storage.exists(nome), nome)
@@ -0,0 +1,183 @@
+"""
+Recebimento de anexos (abertura de ticket e chat) sem carregar o arquivo na memória.
+
+O AnexoUploadHandler substitui os handlers padrão (settings.FILE_UPLOAD_HANDLERS):
+grava os pedaços direto num arquivo temporário, conforme chegam, e conta os bytes.
+Passou de ANEXO_MAX_UPLOAD_SIZE (ou o Content-Length já mostra que vai passar): o
+upload é interrompido na hora (StopUpload), sem ler o resto do corpo, e o
+temporário é apagado. O request fica marcado (`anexo_excedido`, ver
+`anexo_excedido()`) e a view mostra o erro de "arquivo muito grande" no campo, com
+os campos que vieram antes do arquivo. O navegador pode acusar conexão
+interrompida, já que parou de ser lido no meio do envio.
+
+Na mesma passada (sem reler o arquivo depois) o handler calcula o SHA-256 e
+detecta o tipo real pelos primeiros bytes ("magic numbers"). O arquivo recebido
+sai com `sha256` e `mime_detectado`, usados pela validação do formulário e pelo
+anexo do e-mail em vez do content_type informado pelo navegador.
+"""
+
+import hashlib
+import mimetypes
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+
+
+# Bytes do início do arquivo guardados para a detecção do tipo
+TAMANHO_CABECALHO = 2048
+
+# Assinaturas (início do arquivo) -> tipo. DOCX/XLSX/PPTX são ZIP e DOC/XLS/PPT são
+# OLE2: a extensão diz qual dos formatos Office é (ver TIPOS_POR_EXTENSAO).
+ASSINATURAS = (
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"PK\x05\x06", "application/zip"),  # ZIP vazio
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/x-ole-storage"),
+    (b"Rar!\x1a\x07", "application/vnd.rar"),
+    (b"<?xml", "application/xml"),
+)
+
+# BOMs de UTF-32 (LE/BE) e UTF-16 (LE/BE)
+BOMS_UTF16_32 = (b"\xff\xfe\x00\x00", b"\x00\x00\xfe\xff", b"\xff\xfe", b"\xfe\xff")
+
+# Tipos detectados aceitos para cada extensão permitida
+TIPOS_POR_EXTENSAO = {
+    ".pdf": {"application/pdf"},
+    ".png": {"image/png"},
+    ".jpg": {"image/jpeg"},
+    ".jpeg": {"image/jpeg"},
+    ".txt": {"text/plain", "application/xml"},
+    ".csv": {"text/plain"},
+    ".xml": {"application/xml", "text/plain"},
+    ".zip": {"application/zip"},
+    ".rar": {"application/vnd.rar"},
+    ".docx": {"application/zip"},
+    ".xlsx": {"application/zip"},
+    ".pptx": {"application/zip"},
+    ".doc": {"application/x-ole-storage"},
+    ".ppt": {"application/x-ole-storage"},
+    # Muitos sistemas exportam "XLS" que na verdade é texto (CSV/HTML)
+    ".xls": {"application/x-ole-storage", "text/plain"},
+}
+
+
+def detectar_mime(cabecalho: bytes) -> str:
+    """Tipo real a partir dos primeiros bytes; texto sem assinatura vira text/plain."""
+    conteudo = cabecalho.removeprefix(b"\xef\xbb\xbf")  # BOM UTF-8
+    for assinatura, mime in ASSINATURAS:
+        if conteudo.startswith(assinatura):
+            return mime
+    # UTF-16/32 (logs do Windows/PowerShell) têm NULs, mas começam com o BOM
+    if conteudo.startswith(BOMS_UTF16_32):
+        return "text/plain"
+    if b"\x00" not in conteudo:
+        try:
+            conteudo.decode("utf-8")
+            return "text/plain"
+        except UnicodeDecodeError as erro:
+            # Cabeçalho cortado no meio de um caractere ainda é UTF-8
+            if erro.start >= len(conteudo) - 3:
+                return "text/plain"
+        # Latin-1 (planilhas/CSV antigos): só caracteres imprimíveis
+        if all(b >= 0x20 or b in b"\t\r\n\x0c" for b in conteudo):
+            return "text/plain"
+    return "application/octet-stream"
+
+
+def mime_compativel(nome: str, mime: str) -> bool:
+    ext = os.path.splitext(nome)[1].lower()
+    return mime in TIPOS_POR_EXTENSAO.get(ext, ())
+
+
+def analisar(arquivo):
+    """
+    Garante `sha256` e `mime_detectado` em arquivos que não vieram pelo
+    AnexoUploadHandler (ex: testes, shell). Lê o arquivo uma vez.
+    """
+    if getattr(arquivo, "sha256", None) is None:
+        sha = hashlib.sha256()
+        arquivo.seek(0)
+        for pedaco in arquivo.chunks():
+            sha.update(pedaco)
+        arquivo.sha256 = sha.hexdigest()
+        arquivo.seek(0)
+        arquivo.mime_detectado = detectar_mime(arquivo.read(TAMANHO_CABECALHO))
+        arquivo.seek(0)
+    return arquivo
+
+
+def tipo_conteudo(arquivo) -> str:
+    """
+    Content-Type confiável para reenviar o anexo (e-mail): o detectado, refinado
+    pela extensão quando o conteúdo é um contêiner genérico (DOCX é ZIP, CSV é texto).
+    A extensão já foi conferida contra o conteúdo na validação do formulário.
+    """
+    analisar(arquivo)
+    pela_extensao, _ = mimetypes.guess_type(arquivo.name)
+    if pela_extensao and arquivo.mime_detectado in (
+        "application/zip",
+        "application/x-ole-storage",
+        "text/plain",
+    ):
+        return pela_extensao
+    return arquivo.mime_detectado
+
+
+def limite_anexo() -> int:
+    """Tamanho máximo de um anexo, em bytes."""
+    return settings.ANEXO_MAX_UPLOAD_SIZE
+
+
+def anexo_excedido(request):
+    """Campo cujo arquivo foi recusado pelo tamanho neste request (ou None)."""
+    return getattr(request, "anexo_excedido", None)
+
+
+class AnexoUploadHandler(TemporaryFileUploadHandler):
+    """
+    Grava em disco em pedaços e, na mesma passada: impõe o limite de tamanho,
+    calcula o SHA-256 e guarda o cabeçalho para detectar o tipo.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Corpo maior que o anexo máximo mais todos os campos de texto possíveis
+        # (DATA_UPLOAD_MAX_MEMORY_SIZE): o arquivo com certeza passa do limite
+        self.corpo_excedido = bool(
+            content_length
+            and content_length > limite_anexo() + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        )
+        return super().handle_raw_input(input_data, META, content_length, boundary, encoding)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.tamanho = 0
+        self.sha = hashlib.sha256()
+        self.cabecalho = b""
+        # Já se sabe que vai estourar: recusa antes de ler o primeiro byte do arquivo
+        if self.corpo_excedido or (
+            self.content_length and self.content_length > limite_anexo()
+        ):
+            self._recusar()
+
+    def _recusar(self):
+        """Interrompe o upload sem consumir o resto do corpo (o parser apaga o temporário)."""
+        self.request.anexo_excedido = self.field_name
+        raise StopUpload(connection_reset=True)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.tamanho += len(raw_data)
+        if self.tamanho > limite_anexo():
+            self._recusar()
+        self.sha.update(raw_data)
+        if len(self.cabecalho) < TAMANHO_CABECALHO:
+            self.cabecalho += raw_data[: TAMANHO_CABECALHO - len(self.cabecalho)]
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        arquivo = super().file_complete(file_size)
+        arquivo.sha256 = self.sha.hexdigest()
+        arquivo.mime_detectado = detectar_mime(self.cabecalho)
+        return arquivo
@@ -27,19 +27,45 @@ urlpatterns = [
     path("sucesso/", views.ticket_sucesso, name="ticket_sucesso"),
     path("meus-tickets/", views.meus_tickets, name="meus_tickets"),
     path("ticket/<int:pk>/", views.detalhe_ticket, name="detalhe_ticket"),
+    path("ticket/<int:pk>/mensagens/", views.mensagens_ticket, name="mensagens_ticket"),
     # Área de Suporte
     path("fila-atendimento/", views.fila_atendimento, name="fila_atendimento"),
+    path("fila-atendimento/exportar/", views.exportar_fila, name="exportar_fila"),
+    path("metricas/", views.metricas_atendimento, name="metricas_atendimento"),
     # Funcionalidades Auxiliares (Anexos e Notificações)
     path(
         "interacao/anexo/<int:interacao_id>/",
         views.download_anexo_interacao,
         name="download_anexo",
     ),
+    path(
+        "ticket/<int:pk>/anexo/",
+        views.download_anexo_ticket,
+        name="download_anexo_ticket",
+    ),
+    path(
+        "interacao/miniatura/<int:interacao_id>/",
+        views.miniatura_anexo,
+        name="miniatura_anexo",
+    ),
+    path(
+        "ticket/<int:pk>/miniatura/",
+        views.miniatura_ticket,
+        name="miniatura_ticket",
+    ),
     path(
         "notificacao/ler/<int:notificacao_id>/",
         views.marcar_notificacao_lida,
         name="marcar_notificacao_lida",
     ),
+    path(
+        "notificacao/ler-todas/",
+        views.marcar_todas_notificacoes_lidas,
+        name="marcar_todas_notificacoes_lidas",
+    ),
+    path("notificacoes/", views.notificacoes_json, name="notificacoes_json"),
+    # Tempo real (SSE): requer servidor ASGI, roteado só para este caminho (ver asgi.py)
+    path("eventos/", views.eventos_stream, name="eventos"),
 ]
 
 # Configuração para servir arquivos de mídia (Uploads) em ambiente de desenvolvimento
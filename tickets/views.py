@@ -1,21 +1,33 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, HttpRequest, FileResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpRequest, StreamingHttpResponse
 from django.contrib import messages
 from django.urls import reverse
-from .models import Ticket, TicketInteracao, Cliente, Notificacao, MAXIMO_STATUS_CHOICES
-from .forms import TicketForm, TicketInteracaoForm
+from .models import Ticket, TicketInteracao, Cliente, Notificacao, MAXIMO_STATUS_CHOICES, STATUS_ENCERRADOS
+from .forms import TicketForm, TicketInteracaoForm, marcar_anexo_excedido
 from django.db.models import Q
-from .services import MaximoEmailService, NotificationService, MaximoSenderService
+from .services import MaximoEmailService, NotificationService, MaximoSenderService, FilaService
+from . import eventos, metricas, rollups
+from .paginacao import PaginadorCursor
+from .downloads import servir_anexo, servir_miniatura
 from django.template.loader import render_to_string
-from django.http import JsonResponse
-from django.core.paginator import Paginator
+from django.http import JsonResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import condition, require_GET, require_POST
+import asyncio
 import logging
 import os
 import threading
 
 logger = logging.getLogger(__name__)
 
+# Quantas mensagens do chat são renderizadas por vez (página inicial e cada "carregar anteriores")
+TAMANHO_PAGINA_CHAT = 30
+
 
 # PÁGINA INICIAL
 def pagina_inicial(request: HttpRequest) -> HttpResponse:
@@ -39,16 +51,17 @@ def meus_tickets(request: HttpRequest) -> HttpResponse:
     """
     # select_related busca as ForeignKeys numa única query SQL (JOIN)
     # 1. Mantém a sua busca atual (Exemplo genérico)
-    tickets = Ticket.objects.filter(cliente=request.user).select_related('area', 'ambiente').order_by('-data_criacao')
+    tickets = Ticket.objects.filter(cliente=request.user).select_related('area', 'ambiente').defer('busca')
 
-    # 2. APLICA A PAGINAÇÃO (Limite de 10)
-    paginator = Paginator(tickets, 10) 
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 2. APLICA A PAGINAÇÃO (Limite de 10), por cursor: usa o índice (cliente, data_criacao)
+    paginator = PaginadorCursor(tickets, 10)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         # Passamos 'page_obj' mas com o nome 'tickets' para não quebrar o loop do HTML
         "tickets": page_obj, 
+        # O total custa um COUNT (e talvez um EXPLAIN): só quando pedido (?total=1)
+        "mostrar_total": request.GET.get('total') == '1',
     }
     
     return render(request, "tickets/meus_tickets.html", context)
@@ -59,6 +72,7 @@ def meus_tickets(request: HttpRequest) -> HttpResponse:
 def criar_ticket(request: HttpRequest) -> HttpResponse:
     if request.method == "POST":
         form = TicketForm(request.POST, request.FILES, user=request.user)
+        marcar_anexo_excedido(request, form)
 
         if form.is_valid():
             ticket = form.save(commit=False)
@@ -88,12 +102,13 @@ def detalhe_ticket(request: HttpRequest, pk: int) -> HttpResponse:
     origem = request.GET.get("origin")
 
     # Permissão (mantida)
-    if not (request.user.is_support_team or ticket.cliente == request.user):
+    if not (request.user.is_support_team or ticket.cliente_id == request.user.id):
         messages.error(request, "Você não tem permissão para visualizar este ticket.")
         return redirect("meus_tickets")
 
     if request.method == "POST":
         form = TicketInteracaoForm(request.POST, request.FILES)
+        marcar_anexo_excedido(request, form)
         if form.is_valid():
             interacao = form.save(commit=False)
             interacao.ticket = ticket
@@ -114,8 +129,9 @@ def detalhe_ticket(request: HttpRequest, pk: int) -> HttpResponse:
             )
             email_thread.start()
 
-            # Atualiza data de modificação
-            ticket.save()
+            # Atualiza data de modificação (só ela: os contadores de atividade já
+            # foram atualizados no banco pelo signal da interação)
+            ticket.save(update_fields=["data_atualizacao"])
 
             # --- 2. RESPOSTA PARA AJAX (SEM REFRESH) ---
             # Verifica se a requisição veio do JavaScript
@@ -125,7 +141,9 @@ def detalhe_ticket(request: HttpRequest, pk: int) -> HttpResponse:
                     "tickets/partials/chat_message.html",
                     {"interacao": interacao, "request": request},
                 )
-                return JsonResponse({"status": "success", "html": html_mensagem})
+                return JsonResponse(
+                    {"status": "success", "id": interacao.id, "html": html_mensagem}
+                )
 
             # Fallback para navegador sem JS (comportamento antigo)
             url_destino = reverse("tickets:detalhe_ticket", args=[pk])
@@ -142,17 +160,100 @@ def detalhe_ticket(request: HttpRequest, pk: int) -> HttpResponse:
     else:
         form = TicketInteracaoForm()
 
-    interacoes = ticket.interacoes.select_related("autor").all()
+    # Só as últimas N mensagens: as anteriores vêm sob demanda ao rolar (?before=),
+    # então o peso da página não cresce com a idade do ticket
+    ultimas = list(
+        ticket.interacoes.select_related("autor").order_by("-data_criacao", "-pk")[
+            : TAMANHO_PAGINA_CHAT + 1
+        ]
+    )
+    tem_mais_antigas = len(ultimas) > TAMANHO_PAGINA_CHAT
+    interacoes = ultimas[:TAMANHO_PAGINA_CHAT][::-1]
 
     context = {
         "ticket": ticket,
         "interacoes": interacoes,
+        "tem_mais_antigas": tem_mais_antigas,
         "form": form,
         "origem": origem,
     }
     return render(request, "tickets/detalhe_ticket.html", context)
 
 
+@login_required(login_url="/login/")
+@require_GET
+def mensagens_ticket(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Fragmentos do chat, já renderizados:
+    - ?after=<interacao_id>: só as mensagens mais novas que o cursor. Sem novidades
+      responde 304 (sem corpo), então o polling custa uma única query indexada.
+    - ?before=<interacao_id>: a página anterior do histórico (rolagem para cima),
+      paginada por (data_criacao, id).
+    """
+    ticket = get_object_or_404(Ticket, pk=pk)
+
+    if not (request.user.is_support_team or ticket.cliente_id == request.user.id):
+        return JsonResponse({"status": "error", "errors": "Sem permissão."}, status=403)
+
+    try:
+        after = int(request.GET.get("after", 0))
+        before = int(request.GET.get("before", 0))
+    except ValueError:
+        return JsonResponse({"status": "error", "errors": "Cursor inválido."}, status=400)
+
+    interacoes = ticket.interacoes.select_related("autor")
+
+    if before:
+        cursor = interacoes.filter(pk=before).values("data_criacao", "pk").first()
+        if cursor is None:
+            return JsonResponse({"status": "error", "errors": "Cursor inválido."}, status=400)
+
+        # Keyset: tudo que vem antes do cursor na ordem do chat (usa o índice ticket/data/id)
+        anteriores = list(
+            interacoes.filter(
+                Q(data_criacao__lt=cursor["data_criacao"])
+                | Q(data_criacao=cursor["data_criacao"], pk__lt=cursor["pk"])
+            ).order_by("-data_criacao", "-pk")[: TAMANHO_PAGINA_CHAT + 1]
+        )
+        tem_mais = len(anteriores) > TAMANHO_PAGINA_CHAT
+        anteriores = anteriores[:TAMANHO_PAGINA_CHAT][::-1]
+
+        return JsonResponse(
+            {
+                "status": "success",
+                "html": _renderizar_mensagens(request, anteriores),
+                "ids": [interacao.pk for interacao in anteriores],
+                "primeiro_id": anteriores[0].pk if anteriores else None,
+                "tem_mais": tem_mais,
+            }
+        )
+
+    # Cursor por ID (ordem de chegada): pega também logs importados com data retroativa
+    novas = list(interacoes.filter(pk__gt=after).order_by("pk")[:50])
+
+    if not novas:
+        return HttpResponseNotModified()
+
+    return JsonResponse(
+        {
+            "status": "success",
+            "html": _renderizar_mensagens(request, novas),
+            "ids": [interacao.pk for interacao in novas],
+            "ultimo_id": novas[-1].pk,
+        }
+    )
+
+
+def _renderizar_mensagens(request: HttpRequest, interacoes) -> str:
+    return "".join(
+        render_to_string(
+            "tickets/partials/chat_message.html",
+            {"interacao": interacao, "request": request},
+        )
+        for interacao in interacoes
+    )
+
+
 @login_required(login_url="/login/")
 def fila_atendimento(request: HttpRequest) -> HttpResponse:
     """
@@ -167,60 +268,30 @@ def fila_atendimento(request: HttpRequest) -> HttpResponse:
     tickets = (
         Ticket.objects.all()
         .select_related("cliente", "ambiente")
+        .defer("busca")  # o tsvector só serve para filtrar, não para exibir
         .order_by("-data_criacao")
     )
 
-    # 3. Captura dos Filtros via GET
-    status_filter = request.GET.get("status")
-    location_filter = request.GET.get("location")
-    search_query = request.GET.get("q")
-
-    # 4. Aplicação dos Filtros
-    if status_filter:
-        tickets = tickets.filter(status_maximo=status_filter)
-
-    if location_filter:
-        # Filtra tickets onde o 'location' do cliente é igual ao selecionado
-        tickets = tickets.filter(cliente__location=location_filter)
-
-    if search_query:
-        # Busca por ID, Título, Descrição ou Nome do Cliente
-        tickets = tickets.filter(
-            Q(maximo_id__icontains=search_query)
-            | Q(sumario__icontains=search_query)
-            | Q(descricao__icontains=search_query)
-            | Q(cliente__username__icontains=search_query)
-            | Q(cliente__first_name__icontains=search_query)
-            | Q(cliente__location__icontains=search_query)
-        )
+    # 3. Filtros via GET (os mesmos da exportação)
+    tickets, ordenacao = FilaService.filtrar(tickets, request.GET)
+    filtrado = any(request.GET.get(campo) for campo in ("status", "location", "q", "aguardando"))
 
-    # 5. Dados para popular os Dropdowns do Filtro
-    # Pega apenas clientes que não são staff/suporte para limpar a lista
-    lista_locations = (
-        Cliente.objects.values_list("location", flat=True)
-        .exclude(location__isnull=True)
-        .exclude(location__exact="")
-        .distinct()
-        .order_by("location")
-    )
+    # 4. Dados para popular os Dropdowns do Filtro
+    # Locations com a contagem de tickets abertos, do cache (sem DISTINCT por request)
+    lista_locations = FilaService.locations()
 
     status_choices = MAXIMO_STATUS_CHOICES
 
-    # 6. Estatísticas Rápidas (Opcional, mas fica pro)
-    stats = {
-        "total": tickets.count(),
-        "criticos": tickets.filter(prioridade=1).count(),
-        "novos": tickets.filter(status_maximo="NEW").count(),
-    }
-
-    # Define quantos tickets aparecem por página (ex: 15)
-    paginator = Paginator(tickets, 15)
-
-    # Pega o número da página da URL (?page=2)
-    page_number = request.GET.get("page")
+    # 5. Estatísticas Rápidas: uma única query; sem filtros vem do cache
+    if filtrado:
+        stats = FilaService.calcular_estatisticas(tickets)
+    else:
+        stats = FilaService.estatisticas_gerais()
 
-    # Obtém apenas os tickets daquela página específica
-    page_obj = paginator.get_page(page_number)
+    # 15 tickets por página, navegando por cursor (?cursor=...) em vez de ?page=N:
+    # a página 100 custa o mesmo que a primeira
+    paginator = PaginadorCursor(tickets, 15, ordenacao)
+    page_obj = paginator.get_page(request.GET.get("cursor"))
 
     context = {
         "tickets": page_obj,
@@ -232,6 +303,53 @@ def fila_atendimento(request: HttpRequest) -> HttpResponse:
     return render(request, "tickets/fila_atendimento.html", context)
 
 
+@login_required(login_url="/login/")
+def exportar_fila(request: HttpRequest) -> HttpResponse:
+    """
+    Exporta para CSV a fila com os mesmos filtros da tela (todas as páginas),
+    em streaming: memória constante mesmo com centenas de milhares de tickets.
+    """
+    if not request.user.is_support_team:
+        messages.warning(request, "Acesso restrito à equipe de suporte.")
+        return redirect("tickets:meus_tickets")
+
+    tickets, ordenacao = FilaService.filtrar(Ticket.objects.all(), request.GET)
+    tickets = tickets.order_by(*ordenacao)
+
+    nome = f"fila_atendimento_{timezone.localtime():%Y%m%d_%H%M}.csv"
+    response = StreamingHttpResponse(
+        FilaService.linhas_csv(tickets), content_type="text/csv; charset=utf-8"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{nome}"'
+    return response
+
+
+@login_required(login_url="/login/")
+def metricas_atendimento(request: HttpRequest) -> HttpResponse:
+    """
+    Painel de SLA: percentis dos tempos de atendimento por location, área e prioridade.
+    """
+    if not request.user.is_staff:
+        messages.warning(request, "Acesso restrito à administração.")
+        return redirect("tickets:meus_tickets")
+
+    # Último resumo gravado pelo comando calcular_metricas (o request nunca recalcula)
+    resumo = metricas.resumo()
+
+    context = {
+        "resumo": resumo,
+        "metricas": metricas.METRICAS.values(),
+        "dimensoes": [
+            (titulo, resumo["por"][chave]) for chave, titulo in metricas.DIMENSOES.items()
+        ]
+        if resumo
+        else [],
+        # Pré-agregado pelo atualizar_rollups (não lê tickets/ticket_interacoes)
+        "volume_diario": rollups.volume_diario(),
+    }
+    return render(request, "tickets/metricas.html", context)
+
+
 @login_required(login_url="/login/")
 def download_anexo_interacao(request: HttpRequest, interacao_id: int) -> HttpResponse:
     """
@@ -253,17 +371,10 @@ def download_anexo_interacao(request: HttpRequest, interacao_id: int) -> HttpRes
         return redirect("tickets:detalhe_ticket", pk=ticket.id)
 
     try:
-        # 4. Tenta abrir o arquivo
-        # O .path pode falhar dependendo do Storage (S3 vs Local),
-        # mas .open() é o método agnóstico do Django.
-        arquivo = interacao.anexo.open()
-
-        # Opcional: Definir o nome do arquivo no download
+        # 4. Entrega: pelo servidor web (X-Accel-Redirect/X-Sendfile) ou em streaming
+        # pelo Django, conforme settings.ANEXO_DOWNLOAD_MODO (ver downloads.py)
         filename = os.path.basename(interacao.anexo.name)
-
-        # Retorna o arquivo como download (as_attachment=True)
-        # ou visualização no navegador (as_attachment=False)
-        return FileResponse(arquivo, as_attachment=True, filename=filename)
+        return servir_anexo(request, interacao.anexo, filename)
 
     except FileNotFoundError:
         # 5. Tratamento de Erro: Arquivo consta no banco, mas não no disco
@@ -276,6 +387,59 @@ def download_anexo_interacao(request: HttpRequest, interacao_id: int) -> HttpRes
         return redirect("tickets:detalhe_ticket", pk=ticket.id)
 
 
+@login_required(login_url="/login/")
+def download_anexo_ticket(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Anexo enviado na abertura do ticket, com a mesma checagem de permissão do chat.
+    Suporta Range (retomar download) e ETag/Last-Modified (304 se já baixado).
+    """
+    ticket = get_object_or_404(Ticket, pk=pk)
+
+    if ticket.cliente != request.user and not request.user.is_support_team:
+        messages.error(request, "Você não tem permissão para acessar este arquivo.")
+        return redirect("tickets:meus_tickets")
+
+    if not ticket.anexo:
+        messages.warning(request, "Este ticket não possui anexo.")
+        return redirect("tickets:detalhe_ticket", pk=ticket.id)
+
+    try:
+        filename = os.path.basename(ticket.anexo.name)
+        return servir_anexo(request, ticket.anexo, filename)
+
+    except FileNotFoundError:
+        messages.error(request, "Arquivo indisponivel, contate o suporte.")
+        return redirect("tickets:detalhe_ticket", pk=ticket.id)
+
+
+def _servir_miniatura(request, ticket, obj) -> HttpResponse:
+    if ticket.cliente_id != request.user.id and not request.user.is_support_team:
+        raise Http404
+    if not obj.miniatura:
+        raise Http404
+    try:
+        response = servir_miniatura(request, obj.miniatura)
+    except FileNotFoundError:
+        raise Http404
+    return response
+
+
+@login_required(login_url="/login/")
+def miniatura_anexo(request: HttpRequest, interacao_id: int) -> HttpResponse:
+    """Prévia (WebP) do anexo de imagem de uma mensagem do chat."""
+    interacao = get_object_or_404(
+        TicketInteracao.objects.select_related("ticket"), pk=interacao_id
+    )
+    return _servir_miniatura(request, interacao.ticket, interacao)
+
+
+@login_required(login_url="/login/")
+def miniatura_ticket(request: HttpRequest, pk: int) -> HttpResponse:
+    """Prévia (WebP) do anexo de imagem da abertura do ticket."""
+    ticket = get_object_or_404(Ticket, pk=pk)
+    return _servir_miniatura(request, ticket, ticket)
+
+
 @login_required
 def marcar_notificacao_lida(request, notificacao_id):
     notificacao = get_object_or_404(
@@ -283,9 +447,153 @@ def marcar_notificacao_lida(request, notificacao_id):
     )
 
     notificacao.lida = True
-    notificacao.save()
+    # O post_save invalida o cache do sininho
+    notificacao.save(update_fields=["lida"])
 
     # Redireciona para o link da notificação (ex: detalhe do ticket)
     if notificacao.link:
         return redirect(notificacao.link)
     return redirect("tickets:pagina_inicial")
+
+
+@login_required
+@require_POST
+def marcar_todas_notificacoes_lidas(request: HttpRequest) -> HttpResponse:
+    """
+    Marca todas as notificações do usuário como lidas (um único UPDATE).
+    """
+    NotificationService.marcar_todas_lidas(request.user)
+
+    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+        return JsonResponse({"status": "success"})
+
+    # Sem JS: volta para a página de onde veio (se for do próprio portal)
+    origem = request.META.get("HTTP_REFERER")
+    if origem and url_has_allowed_host_and_scheme(origem, allowed_hosts={request.get_host()}):
+        return redirect(origem)
+    return redirect("tickets:pagina_inicial")
+
+
+def _etag_notificacoes(request: HttpRequest):
+    if not request.user.is_authenticated:
+        return None
+    return NotificationService.etag_resumo(request.user)
+
+
+@login_required
+@require_GET
+@condition(etag_func=_etag_notificacoes)
+def notificacoes_json(request: HttpRequest) -> HttpResponse:
+    """
+    Resumo do sininho para polling via JS.
+    Com If-None-Match e nada novo, o decorator `condition` responde 304 sem corpo.
+    """
+    resumo = NotificationService.resumo_nao_lidas(request.user)
+
+    # Mesmo HTML do base.html, para o JS apenas substituir o dropdown
+    html = render_to_string(
+        "tickets/partials/notificacoes_dropdown.html",
+        {
+            "notificacoes_list": resumo["itens"],
+            "notificacoes_count": resumo["total"],
+        },
+        request=request,
+    )
+
+    response = JsonResponse(
+        {
+            "total": resumo["total"],
+            "itens": [
+                {
+                    "id": n.id,
+                    "titulo": n.titulo,
+                    "tipo": n.tipo,
+                    "mensagem": n.mensagem,
+                    "link": reverse("tickets:marcar_notificacao_lida", args=[n.id]),
+                    "data_criacao": n.data_criacao.isoformat(),
+                }
+                for n in resumo["itens"]
+            ],
+            "html": html,
+        }
+    )
+    # Obriga o navegador a revalidar (If-None-Match) a cada polling
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# EVENTOS EM TEMPO REAL (SSE)
+def _renderizar_interacao(request: HttpRequest, interacao_id: int):
+    interacao = (
+        TicketInteracao.objects.select_related("autor").filter(pk=interacao_id).first()
+    )
+    if interacao is None:
+        return None
+    return render_to_string(
+        "tickets/partials/chat_message.html",
+        {"interacao": interacao, "request": request},
+    )
+
+
+async def _gerar_eventos(request: HttpRequest, usuario, ticket):
+    inscricao = eventos.broadcaster.assinar()
+    _, fila = inscricao
+    try:
+        # Reconexão automática do EventSource após 5s se a conexão cair
+        yield "retry: 5000\n\n"
+
+        while True:
+            try:
+                evento = await asyncio.wait_for(fila.get(), timeout=25)
+            except asyncio.TimeoutError:
+                # Comentário SSE: mantém proxies/load balancers sem derrubar a conexão ociosa
+                yield ": ping\n\n"
+                continue
+
+            tipo = evento.get("tipo")
+            if tipo == "notificacao" and usuario.pk in evento.get("destinatarios", []):
+                yield eventos.formatar_sse("notificacao", {})
+
+            elif tipo == "interacao" and ticket and evento.get("ticket_id") == ticket.pk:
+                html = await sync_to_async(_renderizar_interacao)(request, evento["id"])
+                if html:
+                    yield eventos.formatar_sse(
+                        "interacao", {"id": evento["id"], "html": html}
+                    )
+    finally:
+        # Cliente desconectou: o Django cancela o gerador e liberamos a fila
+        eventos.broadcaster.cancelar(inscricao)
+
+
+@login_required(login_url="/login/")
+async def eventos_stream(request: HttpRequest) -> HttpResponse:
+    """
+    Stream SSE com novas mensagens do ticket (?ticket=<id>) e avisos do sininho.
+    Só é servido via ASGI (portal_suporte/asgi.py, que atende apenas /eventos/):
+    no WSGI a conexão prenderia um worker inteiro, então respondemos 204 e o
+    navegador segue com o polling.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    usuario = await request.auser()
+
+    ticket = None
+    ticket_id = request.GET.get("ticket", "")
+    if ticket_id:
+        if ticket_id.isdigit():
+            ticket = await Ticket.objects.filter(pk=ticket_id).afirst()
+
+        pode_ver = ticket is not None and await sync_to_async(
+            lambda: usuario.is_support_team or ticket.cliente_id == usuario.pk
+        )()
+        if not pode_ver:
+            return HttpResponse(status=403)
+
+    response = StreamingHttpResponse(
+        _gerar_eventos(request, usuario, ticket), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Nginx: não segurar o stream em buffer
+    response["X-Accel-Buffering"] = "no"
+    return response